@@ -0,0 +1,298 @@
+"""Headless benchmarks for the cataloging hot paths.
+
+Generates synthetic JPEG folders and catalog reports, then times load_image, toggle_zoom,
+draw_defects_on_image and save_to_excel with all Tk display work stubbed out.
+
+Run from the project folder so arial.ttf is found, like the GUI:
+python benchmark.py [--resolutions 1280x960,4032x3024] [--report-rows 0,1000,10000,100000]
+                    [--images 10] [--repeats 20] [--work-dir DIR]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+import openpyxl
+from PIL import Image
+
+import gui
+from previews import PreviewIndex, PreviewWriter
+import config
+
+# Fewer timed calls make percentiles meaningless
+MIN_SAMPLES = 5
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def current_rss():
+    """Resident set size in bytes from /proc (Linux), or None where it is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+class RssSampler:
+    """Sample the RSS every millisecond on a thread while an operation runs, to get its peak.
+
+    Pillow allocates image memory in C, which tracemalloc does not see, and ru_maxrss is
+    the process-lifetime maximum. Pillow releases the GIL while decoding and resizing, so
+    the sampler keeps running during the expensive parts.
+    """
+
+    def __init__(self):
+        self.start = current_rss()
+        self.peak = self.start
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stop_event.wait(0.001):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        if self.start is not None:
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.peak = max(self.peak, current_rss())
+
+    def peak_delta(self):
+        """Peak RSS above the RSS at the start, in bytes, or None where RSS is not available."""
+        return None if self.start is None else self.peak - self.start
+
+class StubWidget:
+    """Stand-in for Tk widgets and windows. Keeps bound callbacks so zoom steps can be triggered."""
+
+    def __init__(self, *args, **kwargs):
+        self.bindings = {}
+        self.text = ""
+
+    def bind(self, sequence, func):
+        self.bindings[sequence] = func
+
+    def get(self):
+        return self.text
+
+    def winfo_screenwidth(self):
+        return 1920
+
+    def winfo_screenheight(self):
+        return 1080
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+class StubCanvas(StubWidget):
+    """Remembers the last canvas created, which is the one toggle_zoom binds its wheel zoom to."""
+    last = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        StubCanvas.last = self
+
+class StubVar:
+    def __init__(self, value=None, **kwargs):
+        self.value = kwargs.get("value", value)
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+class StubPhotoImage:
+    def __init__(self, img):
+        img.load()
+
+def stub_tk():
+    """Replace the Tk classes gui.py creates on the hot paths with headless stubs."""
+    gui.tk.Toplevel = gui.tk.Label = StubWidget
+    gui.tk.Canvas = StubCanvas
+    gui.ttk.Scrollbar = StubWidget
+    gui.tk.BooleanVar = StubVar
+    gui.ImageTk.PhotoImage = StubPhotoImage
+    gui.messagebox.showerror = lambda title, message: print(f"{title}: {message}")
+
+def make_gui():
+    """An ImageDownloaderGUI with the state of an open cataloging window, without any Tk root."""
+    app = gui.ImageDownloaderGUI.__new__(gui.ImageDownloaderGUI)
+    app.root = StubWidget()
+    app.image_label = StubWidget()
+    app.filename_label = StubWidget()
+    app.duplicate_label = StubWidget()
+    app.duplicate_button = StubWidget()
+    app.comments_entry = StubWidget()
+    app.comments_entry.text = "benchmark comment"
+    app.bwu_var = StubVar("PRO\n")
+    app.bwu_buttons = {}
+    app.defect_vars = {defect: StubVar(False) for row in gui.DEFECT_ROWS for defect in row}
+    app.defect_buttons = {defect: StubWidget() for defect in app.defect_vars}
+    for defect in ("Switched\nOFF", "Shelf\nlight", "EMPTY 1"):
+        app.defect_vars[defect].set(True)
+    app.catalog_pack = None
+    app.duplicate_index = None
+    app.current_image_index = 0
+    app.zoom_level = 0
+    return app
+
+def make_images(folder, resolution, count, previews):
+    """Write count noisy JPEGs at the resolution, optionally with download-time previews."""
+    folder.mkdir(parents=True, exist_ok=True)
+    width, height = resolution
+    preview_writer = PreviewWriter(folder, config.PREVIEW_SIZE, config.PREVIEW_PROFILE) if previews else None
+    names = []
+    for i in range(count):
+        # Noise keeps the JPEG size close to a real photo
+        img = Image.merge('RGB', [
+            Image.effect_noise((width, height), 40 + i % 20),
+            Image.linear_gradient('L').resize((width, height)),
+            Image.effect_noise((width, height), 60)
+        ])
+        name = f"PRO.R{i % 10}.{1000 + i}.{i}.jpg"
+        img.save(folder / name, 'JPEG')
+        if preview_writer is not None:
+            preview_writer.add_from_bytes(name, (folder / name).read_bytes())
+        names.append(name)
+    if preview_writer is not None:
+        preview_writer.close()
+    return names
+
+def make_report(path, rows):
+    """Write a catalog report with a header and the given number of filled rows."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Catalog Report")
+    ws.append(["", "", "", "", "BWU"] + [f"Defect {i}" for i in range(28)] + ["Comment"])
+    for i in range(rows):
+        ws.append(["PRO", f"R{i % 10}", 1000 + i, i, "PRO"] + ["Shelf light" if i % 3 == 0 else ""] * 28 + [""])
+    wb.save(path)
+
+def measure(results, operation, case, op, repeats, setup=None):
+    """Time op repeats times (at least MIN_SAMPLES, setup untimed), then run it once more to
+    measure its Python heap peak (tracemalloc) and its RSS peak above the RSS at the start."""
+    repeats = max(repeats, MIN_SAMPLES)
+    samples = []
+    for i in range(repeats):
+        if setup:
+            setup(i)
+        start = time.perf_counter()
+        op(i)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    if setup:
+        setup(repeats)
+    tracemalloc.start()
+    with RssSampler() as rss:
+        op(repeats)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    rss_delta = rss.peak_delta()
+
+    samples.sort()
+    results.append({
+        "operation": operation,
+        "case": case,
+        "n": len(samples),
+        "mean": statistics.fmean(samples),
+        "p50": statistics.median(samples),
+        # Inclusive method: stays within the samples instead of extrapolating past the max
+        "p95": statistics.quantiles(samples, n=20, method="inclusive")[18],
+        "max": samples[-1],
+        "py_heap_peak_mb": peak / 1024 ** 2,
+        "rss_peak_delta_mb": rss_delta / 1024 ** 2 if rss_delta is not None else None
+    })
+    print_row(results[-1])
+
+def print_header():
+    print(f"{'operation':<22}{'case':<28}{'n':>5}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"
+          f"{'py heap MB':>12}{'RSS +MB':>12}")
+
+def print_row(row):
+    rss = f"{row['rss_peak_delta_mb']:.1f}" if row['rss_peak_delta_mb'] is not None else "-"
+    print(f"{row['operation']:<22}{row['case']:<28}{row['n']:>5}{row['mean']:>10.1f}{row['p50']:>10.1f}"
+          f"{row['p95']:>10.1f}{row['max']:>10.1f}{row['py_heap_peak_mb']:>12.1f}{rss:>12}")
+
+def bench_images(results, app, work_dir, resolution, image_count, repeats):
+    width, height = resolution
+    for previews in (False, True):
+        case = f"{width}x{height}" + (" previews" if previews else "")
+        folder = work_dir / case.replace(" ", "_")
+        images = make_images(folder, resolution, image_count, previews)
+        app.preview_index = PreviewIndex(folder)
+
+        def load(i):
+            app.current_image_index = i % len(images)
+            app.load_image(str(folder), images, app.root)
+        measure(results, "load_image", case, load, repeats)
+
+        if previews:
+            continue
+
+        def open_zoom(i):
+            app.current_image_index = i % len(images)
+            app.zoom_level = 0
+            app.toggle_zoom(None, str(folder), images, app.root)
+        measure(results, "toggle_zoom open", case, open_zoom, repeats)
+
+        # Wheel zoom steps in the last opened zoom window, alternating in and out so the scale stays near 1
+        open_zoom(0)
+        bindings = StubCanvas.last.bindings
+        measure(results, "toggle_zoom step", case,
+                lambda i: bindings["<Button-4>" if i % 2 == 0 else "<Button-5>"](None), repeats)
+
+        # Clicking the zoomed image sets zoom_level to -1, the next click goes back to the thumbnail
+        def close_zoom(i):
+            app.current_image_index = i % len(images)
+            app.zoom_level = -1
+            app.toggle_zoom(None, str(folder), images, app.root)
+        measure(results, "toggle_zoom close", case, close_zoom, repeats)
+
+        scratch = work_dir / "scratch.jpg"
+
+        def copy_image(i):
+            shutil.copyfile(folder / images[i % len(images)], scratch)
+        measure(results, "draw_defects_on_image", case, lambda i: app.draw_defects_on_image(str(scratch)),
+                repeats, setup=copy_image)
+
+def bench_reports(results, app, work_dir, report_rows, repeats):
+    for rows in report_rows:
+        app.excel_path = work_dir / f"report_{rows}.xlsx"
+        make_report(app.excel_path, rows)
+        # Reloading a large workbook takes seconds, fewer repeats keep the run short
+        count = repeats if rows <= 10000 else max(MIN_SAMPLES, repeats // 10)
+        measure(results, "save_to_excel", f"{rows} rows", lambda i: app.save_to_excel(f"PRO.R1.2000.{i}.jpg"), count)
+
+def parse_resolutions(value):
+    return [tuple(int(part) for part in item.split("x")) for item in value.split(",") if item]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cataloging hot paths without a display")
+    parser.add_argument("--resolutions", default="1280x960,4032x3024", help="Comma separated WIDTHxHEIGHT list")
+    parser.add_argument("--report-rows", default="0,1000,10000,100000", help="Comma separated report sizes")
+    parser.add_argument("--images", type=int, default=10, help="Synthetic images per folder")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed calls per operation")
+    parser.add_argument("--work-dir", help="Keep generated data in this folder instead of a temporary one")
+    args = parser.parse_args()
+
+    stub_tk()
+    app = make_gui()
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = Path(args.work_dir or temp_dir)
+        work_dir.mkdir(parents=True, exist_ok=True)
+        print_header()
+        for resolution in parse_resolutions(args.resolutions):
+            bench_images(results, app, work_dir, resolution, args.images, args.repeats)
+        bench_reports(results, app, work_dir, [int(rows) for rows in args.report_rows.split(",") if rows],
+                      args.repeats)
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import asyncio
+import contextlib
+import logging
+import time
+import urllib.parse
+
+from retryscheduler import RetryableError
+
+# Weight of the newest sample in the latency and error rate moving averages
+EWMA_ALPHA = 0.1
+
+class HostLimiter:
+    """AIMD limit on in-flight requests to one host."""
+
+    def __init__(self, host, initial, minimum, maximum, latency_tolerance, error_threshold, cooldown):
+        self.host = host
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_tolerance = latency_tolerance
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.latency = None
+        self.base_latency = None
+        self.error_rate = 0.0
+        self.last_decrease = 0.0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency, outcome):
+        async with self.condition:
+            self.in_flight -= 1
+            self._adjust(latency, outcome)
+            self.condition.notify(max(1, int(self.limit) - self.in_flight))
+
+    def _adjust(self, latency, outcome):
+        failed = outcome != "ok"
+        self.error_rate += EWMA_ALPHA * (failed - self.error_rate)
+        if not failed:
+            self.latency = latency if self.latency is None else self.latency + EWMA_ALPHA * (latency - self.latency)
+            # Baseline is the best smoothed latency seen, drifting up slowly so it can recover
+            self.base_latency = self.latency if self.base_latency is None else min(self.base_latency * 1.001, self.latency)
+
+        if outcome == "rate_limit":
+            factor = 0.5
+        elif failed and self.error_rate > self.error_threshold:
+            factor = 0.75
+        elif not failed and self.latency > self.latency_tolerance * self.base_latency:
+            factor = 0.9
+        else:
+            factor = None
+
+        now = time.monotonic()
+        if factor is not None:
+            # One decrease per cooldown, so a burst of failures from the same window counts once
+            if now - self.last_decrease >= max(self.cooldown, self.latency or 0):
+                old_limit = int(self.limit)
+                self.limit = max(self.minimum, self.limit * factor)
+                self.last_decrease = now
+                if int(self.limit) != old_limit:
+                    logging.info(
+                        f"Concurrency for {self.host} lowered to {int(self.limit)} ({outcome})",
+                        extra={"stage": "concurrency"}
+                    )
+        elif not failed:
+            # Additive increase: about one extra slot per full window of successful requests
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+class ConcurrencyController:
+    """Per-host adaptive concurrency for the downloader.
+
+    Each host starts at `initial` in-flight requests. Successful requests grow the limit
+    additively; 429s, a high error rate or latency well above the host's baseline shrink it
+    multiplicatively, always within [minimum, maximum].
+    """
+
+    def __init__(self, initial, minimum, maximum, latency_tolerance, error_threshold, cooldown):
+        self.settings = (initial, minimum, maximum, latency_tolerance, error_threshold, cooldown)
+        self.hosts = {}
+
+    def _limiter(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = HostLimiter(host, *self.settings)
+        return self.hosts[host]
+
+    @contextlib.asynccontextmanager
+    async def slot(self, url):
+        """Hold one request slot for the URL's host and feed the outcome back into its limit.
+
+        The time spent inside is the latency sample, so wrap the HTTP request only and do
+        decoding or other local work after the slot is released.
+        """
+        limiter = self._limiter(url)
+        await limiter.acquire()
+        start = time.monotonic()
+        outcome = "ok"
+        try:
+            yield
+        except RetryableError as e:
+            outcome = e.error_class
+            raise
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            await limiter.release(time.monotonic() - start, outcome)
+
+    def limits(self):
+        """Current limit per host."""
+        return {host: int(limiter.limit) for host, limiter in self.hosts.items()}
+
+    def summary(self):
+        return ", ".join(f"{host}: {limit}" for host, limit in self.limits().items())
@@ -1,14 +1,90 @@
 import logging
 
-# Logging Config
-logging.basicConfig(
-    filename="errors.log",
+import logpipeline
+
+# Logging Config: JSON lines written to errors.log by a background thread
+LOG_FILE = "errors.log"
+LOG_MAX_BYTES = 10 * 1024 * 1024  # Rotate errors.log at 10 MB
+LOG_BACKUP_COUNT = 5
+# At most LOG_RATE_LIMIT records per call site every LOG_RATE_WINDOW seconds, the rest are summarized
+LOG_RATE_LIMIT = 20
+LOG_RATE_WINDOW = 60
+logpipeline.setup_logging(
+    LOG_FILE,
     level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
+    max_bytes=LOG_MAX_BYTES,
+    backup_count=LOG_BACKUP_COUNT,
+    rate_limit=LOG_RATE_LIMIT,
+    rate_window=LOG_RATE_WINDOW
 )
 #int value for the logic of printing the defects in the top right of the image. Might change with new defects being added
 MAX_DEFECT_LENGTH = 20
 
+# Duplicate detection: max Hamming distance between 64-bit dHashes to count as the same scene
+DUPLICATE_HASH_THRESHOLD = 6
+# Hash cache and decision log, stored next to catalog_report.xlsx
+DUPLICATE_CACHE_FILE = "phash_cache.sqlite3"
+DUPLICATE_DECISIONS_FILE = "phash_decisions.jsonl"
+# Commit the hash cache every N freshly indexed images
+DUPLICATE_INDEX_SAVE_EVERY = 500
+
+# Download output: "files" writes one JPEG per row into the save folder,
+# "pack" appends them to large pack files with an index (see imagepack.py)
+OUTPUT_FORMAT = "files"
+# With "files": "flat" puts every image in the save folder, "sharded" in <region>/<outlet> subfolders
+# parsed from the bwu.region.outlet.scene file name (see folderindex.py)
+OUTPUT_LAYOUT = "flat"
+PACK_MAX_BYTES = 2 * 1024 ** 3  # Start a new pack file after 2 GB
+
+# Page URL -> image URL cache, lets reruns skip fetching and parsing the landing page
+RESOLUTION_CACHE_ENABLED = True
+RESOLUTION_CACHE_FILE = "resolution_cache.sqlite3"
+RESOLUTION_CACHE_TTL = 7 * 24 * 3600  # Seconds before a cached page is fetched again
+RESOLUTION_CACHE_MAX_ENTRIES = 500000  # Least recently used entries are dropped beyond this
+
+# Download retries: per-row budget for each error class, backoff is jittered and doubles per retry
+RETRY_BUDGETS = {"rate_limit": 5, "server": 3, "network": 3}
+RETRY_BACKOFF_FACTOR = 1  # Seconds before the first retry
+RETRY_MAX_DELAY = 60
+
+# Downloader concurrency: AIMD limit per host between CONCURRENCY_MIN and CONCURRENCY_MAX
+CONCURRENCY_INITIAL = 50
+CONCURRENCY_MIN = 4
+CONCURRENCY_MAX = 200
+CONCURRENCY_LATENCY_TOLERANCE = 2.0  # Back off when latency exceeds this multiple of the host's baseline
+CONCURRENCY_ERROR_THRESHOLD = 0.1  # Back off when the smoothed error rate exceeds this
+CONCURRENCY_COOLDOWN = 1.0  # Minimum seconds between two decreases
+DOWNLOAD_WORKERS = 400  # Rows in progress at once, keep well above CONCURRENCY_MAX
+
+# Previews written at download time into <save folder>/_previews, used by the cataloging view
+PREVIEWS_ENABLED = True
+PREVIEW_SIZE = (800, 600)  # Same as the cataloging view
+
+# Grid mode: thumbnail size and how many decoded thumbnails are kept in memory
+GRID_THUMBNAIL_SIZE = (160, 120)
+GRID_CACHE_SIZE = 400
+
+# Image encoding profiles. format is "JPEG" or "WEBP". quality "keep" reuses the source JPEG's
+# quantization tables (no extra loss on re-save), falling back to fallback_quality otherwise.
+# subsampling: "4:4:4", "4:2:2", "4:2:0" or "keep". keep_metadata carries EXIF and ICC over.
+ENCODING_PROFILES = {
+    "archival": {
+        "format": "JPEG", "quality": "keep", "fallback_quality": 92, "subsampling": "keep",
+        "progressive": True, "optimize": True, "keep_metadata": True
+    },
+    "preview": {
+        "format": "JPEG", "quality": 80, "subsampling": "4:2:0",
+        "progressive": False, "optimize": True, "keep_metadata": False
+    },
+    "delivery": {
+        "format": "WEBP", "quality": 82, "method": 4, "keep_metadata": True
+    }
+}
+DOWNLOAD_PROFILE = "archival"  # Date-stamped downloads
+DEFECT_IMAGE_PROFILE = "archival"  # Submitted images with defects drawn on them
+PREVIEW_PROFILE = "preview"  # Previews in <save folder>/_previews
+ENCODING_REPORT_FILE = "encoding_report.jsonl"  # Bytes in/out per profile, one line per download run or catalog session
+
 def flip(flipper):
     flipper = (flipper + 1) % 2  # Toggles between 0 and 1
     return flipper
@@ -0,0 +1,305 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from queue import Queue, Empty
+from pathlib import Path
+import numpy as np
+from PIL import Image
+
+import config
+
+def dhash(image_file, hash_size=8):
+    """Compute a 64-bit difference hash (dHash) of an image path or file object."""
+    with Image.open(image_file) as img:
+        # Let the JPEG decoder downscale while decoding, we only need a few pixels
+        img.draft('L', (hash_size * 8, hash_size * 8))
+        small = img.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+def hamming_distances(hashes, value):
+    """Vectorized Hamming distance between an array of uint64 hashes and a single hash."""
+    xor = np.bitwise_xor(hashes, np.uint64(value))
+    return np.unpackbits(xor.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+
+def to_signed(value):
+    """SQLite integers are signed 64-bit, store the unsigned hash with the same bits."""
+    return value - 2 ** 64 if value >= 2 ** 63 else value
+
+def to_unsigned(value):
+    return value + 2 ** 64 if value < 0 else value
+
+class DuplicateIndex:
+    """Perceptual-hash index of catalog images and of previously made decisions.
+
+    Hashes of images in the catalog folder are cached in a SQLite file keyed by path,
+    with mtime and size, so reopening a folder only hashes new files. Decisions are
+    appended to a JSON-lines file, one record per cataloged image.
+
+    Hashing only happens on the background indexer thread: callers on the Tk thread use
+    cached_hash(), request_hash() and record_decisions(), which never decode an image.
+    """
+
+    def __init__(self, cache_path, decisions_path, threshold=config.DUPLICATE_HASH_THRESHOLD):
+        self.decisions_path = Path(decisions_path)
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.requests = Queue()
+        self.requested = set()
+        self.pending = 0
+        self.decisions = []
+        self.hash_list = []
+        self.hash_array = np.empty(0, dtype=np.uint64)
+        # Shared by the Tk and indexer threads, always used under self.lock
+        self.connection = sqlite3.connect(cache_path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "key TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL, hash INTEGER NOT NULL)"
+        )
+        self.connection.commit()
+        self.load()
+
+    def load(self):
+        if self.decisions_path.exists():
+            try:
+                with open(self.decisions_path, 'r', encoding='utf-8') as f:
+                    self.decisions = [json.loads(line) for line in f if line.strip()]
+            except Exception as e:
+                logging.error(f"Error loading decisions {self.decisions_path}: {e}")
+                self.decisions = []
+        self.hash_list = [d["hash"] for d in self.decisions]
+        self.hash_array = np.array(self.hash_list, dtype=np.uint64)
+
+    def save(self):
+        with self.lock:
+            try:
+                self.connection.commit()
+            except sqlite3.Error as e:
+                logging.error(f"Error saving hash cache: {e}")
+            self.pending = 0
+
+    def close(self):
+        """Finish queued decisions, stop the indexer and close the hash cache."""
+        self.stop_indexing()
+        self.save()
+        with self.lock:
+            self.connection.close()
+
+    @staticmethod
+    def _key(image_path, pack=None):
+        if pack is not None:
+            return f"{os.path.abspath(pack.folder)}::{os.path.basename(image_path)}"
+        return os.path.abspath(image_path)
+
+    @staticmethod
+    def _identity(image_path, pack=None):
+        """Images of a pack folder are identified by their pack location instead of mtime and size."""
+        if pack is not None:
+            _, pack_number, offset, length = pack.entry(os.path.basename(image_path))
+            return [pack_number * 2 ** 40 + offset, length]
+        stat = os.stat(image_path)
+        return [stat.st_mtime, stat.st_size]
+
+    def _cached(self, key, identity):
+        with self.lock:
+            row = self.connection.execute("SELECT mtime, size, hash FROM hashes WHERE key = ?", (key,)).fetchone()
+        if row and list(row[:2]) == identity:
+            return to_unsigned(row[2])
+        return None
+
+    def cached_hash(self, image_path, pack=None):
+        """Return the cached hash of an image, or None if it has not been hashed yet. Never decodes."""
+        try:
+            identity = self._identity(image_path, pack)
+        except (OSError, KeyError):
+            return None
+        return self._cached(self._key(image_path, pack), identity)
+
+    def get_hash(self, image_path, pack=None):
+        """Return the cached hash of an image, computing it if the file is new or changed.
+        Decodes the image, so only the indexer thread calls this."""
+        key = self._key(image_path, pack)
+        try:
+            identity = self._identity(image_path, pack)
+        except (OSError, KeyError) as e:
+            logging.warning(f"Cannot locate {image_path} for hashing: {e}")
+            return None
+        cached = self._cached(key, identity)
+        if cached is not None:
+            return cached
+        try:
+            if pack is not None:
+                value = dhash(pack.open(os.path.basename(image_path)))
+            else:
+                value = dhash(image_path)
+        except Exception as e:
+            logging.error(f"Error hashing {image_path}: {e}")
+            return None
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO hashes (key, mtime, size, hash) VALUES (?, ?, ?, ?)",
+                (key, identity[0], identity[1], to_signed(value))
+            )
+            self.pending += 1
+            commit = self.pending >= config.DUPLICATE_INDEX_SAVE_EVERY
+        if commit:
+            self.save()
+        return value
+
+    def start_indexing(self, catalog_folder, images, pack=None):
+        """Hash all images of the catalog folder in a background thread.
+
+        The thread keeps running after the folder is done, to serve request_hash() and
+        decisions whose hash was not cached yet.
+        """
+        self.stop_indexing()
+        self.stop_event = threading.Event()
+        self.requests = Queue()
+        self.requested = set()
+        self.thread = threading.Thread(
+            target=self._index_worker, args=(catalog_folder, list(images), self.stop_event, self.requests, pack),
+            daemon=True
+        )
+        self.thread.start()
+
+    def stop_indexing(self):
+        """Stop the indexer. Decisions already queued are still hashed and recorded first."""
+        if self.thread and self.thread.is_alive():
+            self.stop_event.set()
+            self.requests.put(None)  # Wake the worker if it is waiting for requests
+            self.thread.join()
+
+    def request_hash(self, image_path):
+        """Ask the background indexer to hash an image next, ahead of the rest of the folder."""
+        with self.lock:
+            if image_path in self.requested:
+                return
+            self.requested.add(image_path)
+        self.requests.put(image_path)
+
+    def is_pending(self, image_path):
+        """True while a request_hash() for the image has not been handled yet."""
+        with self.lock:
+            return image_path in self.requested and self.thread is not None and self.thread.is_alive()
+
+    def _index_worker(self, catalog_folder, images, stop_event, requests, pack=None):
+        # Decisions and requested images first, then the rest of the folder, then wait for more
+        remaining = iter(images)
+        folder_done = False
+        while True:
+            try:
+                item = requests.get_nowait()
+            except Empty:
+                if stop_event.is_set():
+                    break
+                image = next(remaining, None)
+                if image is not None:
+                    item = os.path.join(catalog_folder, image)
+                else:
+                    if not folder_done:
+                        folder_done = True
+                        self.save()
+                        if config.DEBUG:
+                            print(f"Hash index updated for {catalog_folder}")
+                    item = requests.get()
+            if item is None:
+                continue  # Stop signal, finish the queued decisions first
+            if isinstance(item, tuple):
+                self._hash_decisions([item] + self._drain_decisions(requests))
+            elif not stop_event.is_set():
+                self.get_hash(item, pack)
+                with self.lock:
+                    self.requested.discard(item)
+        self.save()
+
+    @staticmethod
+    def _drain_decisions(requests):
+        """Take the decisions queued right behind one, so a batch is appended at once."""
+        decisions = []
+        while True:
+            try:
+                item = requests.get_nowait()
+            except Empty:
+                return decisions
+            if isinstance(item, tuple):
+                decisions.append(item)
+            else:
+                requests.put(item)  # Hash requests wait behind the batch
+                return decisions
+
+    def _hash_decisions(self, items):
+        records = []
+        for hash_path, record in items:
+            try:
+                record["hash"] = dhash(hash_path)
+                records.append(record)
+            except Exception as e:
+                logging.error(f"Error hashing {hash_path} for its decision: {e}")
+        self._append_decisions(records)
+
+    def find_duplicate(self, value):
+        """Return the closest previous decision within the threshold, or None."""
+        if value is None:
+            return None
+        with self.lock:
+            if len(self.hash_array) != len(self.hash_list):
+                self.hash_array = np.array(self.hash_list, dtype=np.uint64)
+            hashes = self.hash_array
+            decisions = self.decisions
+        if len(hashes) == 0:
+            return None
+        distances = hamming_distances(hashes, value)
+        best = int(np.argmin(distances))
+        if distances[best] > self.threshold:
+            return None
+        return decisions[best]
+
+    @staticmethod
+    def decision(image_path, action, bwu, defects, comment):
+        """Decision record for an image, without its hash."""
+        return {
+            "image": os.path.basename(image_path),
+            "action": action,
+            "bwu": bwu,
+            "defects": defects,
+            "comment": comment
+        }
+
+    def record_decisions(self, entries, pack=None):
+        """Store the decisions made for images so later near-duplicates can reuse them.
+
+        entries are (image path, cached hash or None, path of the image after it was moved,
+        decision record). Call after the images left the catalog folder: records with a
+        hash are appended at once, the others are hashed from their new path by the indexer.
+        """
+        ready = []
+        with self.lock:
+            for image_path, value, moved_path, record in entries:
+                # The file has left the catalog folder
+                self.connection.execute("DELETE FROM hashes WHERE key = ?", (self._key(image_path, pack),))
+                if value is not None:
+                    ready.append({"hash": value, **record})
+        self._append_decisions(ready)
+        for image_path, value, moved_path, record in entries:
+            if value is None:
+                if self.thread is not None and self.thread.is_alive():
+                    self.requests.put((moved_path, record))
+                else:
+                    logging.warning(f"Decision for {image_path} not recorded, no hash and no indexer")
+
+    def _append_decisions(self, records):
+        if not records:
+            return
+        try:
+            with open(self.decisions_path, 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        except Exception as e:
+            logging.error(f"Error saving {len(records)} decisions: {e}")
+        with self.lock:
+            self.decisions.extend(records)
+            self.hash_list.extend(record["hash"] for record in records)
@@ -0,0 +1,157 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+
+from previews import PREVIEW_FOLDER
+
+# Listing cache kept in its own subfolder, so saving it doesn't change the root folder's mtime.
+# This folder and the previews folder are not listed.
+INDEX_FOLDER = "_index"
+INDEX_FILE = "listing.json"
+UNSORTED_SHARD = "unsorted"
+
+def parse_name(name):
+    """Split a bwu.region.outlet.scene.jpg file name like save_to_excel does. Returns (bwu, region, outlet, scene)."""
+    parts = os.path.basename(name).rsplit('.', 4)
+    if len(parts) >= 4:
+        return tuple(parts[:4])
+    return "", "", "", ""
+
+def matches(name, region=None, outlet=None):
+    """True if the image belongs to the region and outlet, either of which may be empty."""
+    _, name_region, name_outlet, _ = parse_name(name)
+    return (not region or name_region == region) and (not outlet or name_outlet == outlet)
+
+def shard_for(name):
+    """Relative shard folder of an image: region/outlet, or unsorted for names that don't parse."""
+    _, region, outlet, _ = parse_name(name)
+    if not region or not outlet:
+        return UNSORTED_SHARD
+    return os.path.join(region, outlet)
+
+def sharded_path(folder, name):
+    return Path(folder) / shard_for(name) / name
+
+class FolderIndex:
+    """Listing of the images under a folder, flat or sharded, refreshed incrementally.
+
+    The listing is cached per directory together with the directory's mtime. Adding or
+    removing a file changes the mtime of its directory only, so a refresh stats every
+    directory but rescans (with os.scandir) just the ones that changed.
+
+    Top-level files are always listed. Below that only the two shard levels are walked, and
+    a file there is listed only if it sits in its own shard (unsorted/ or <region>/<outlet>/),
+    so flat and sharded folders both work and unrelated subfolders stay out of the catalog.
+    """
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self.index_path = self.folder / INDEX_FOLDER / INDEX_FILE
+        # Relative directory -> {"mtime": mtime_ns, "files": [names], "dirs": [names]}
+        self.directories = {}
+        self.rescanned = 0
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self.directories = json.load(f)
+            except Exception as e:
+                logging.error(f"Error loading folder index {self.index_path}: {e}")
+                self.directories = {}
+        self.refresh()
+
+    def refresh(self):
+        """Bring the listing up to date, rescanning only directories whose mtime changed."""
+        directories = {}
+        pending = [""]
+        while pending:
+            relative = pending.pop()
+            path = self.folder / relative
+            try:
+                mtime = path.stat().st_mtime_ns
+            except OSError:
+                continue
+            cached = self.directories.get(relative)
+            if cached is None or cached["mtime"] != mtime:
+                cached = self._scan(relative, mtime)
+                self.rescanned += 1
+            directories[relative] = cached
+            if self._descends(relative):
+                pending.extend(os.path.join(relative, name) for name in cached["dirs"])
+        self.directories = directories
+
+    @staticmethod
+    def _depth(relative):
+        return len(Path(relative).parts)
+
+    def _descends(self, relative):
+        depth = self._depth(relative)
+        return depth == 0 or (depth == 1 and relative != UNSORTED_SHARD)
+
+    @staticmethod
+    def _lists(relative, name):
+        return not relative or shard_for(name) == relative
+
+    def _scan(self, relative, mtime):
+        files, dirs = [], []
+        with os.scandir(self.folder / relative) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    files.append(entry.name)
+                elif entry.is_dir() and entry.name not in (INDEX_FOLDER, PREVIEW_FOLDER):
+                    dirs.append(entry.name)
+        return {"mtime": mtime, "files": sorted(files), "dirs": sorted(dirs)}
+
+    def save(self):
+        try:
+            self.index_path.parent.mkdir(exist_ok=True)
+            tmp_path = self.index_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.directories, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logging.error(f"Error saving folder index {self.index_path}: {e}")
+
+    def images(self, extensions, region=None, outlet=None):
+        """Relative paths of the images, optionally only those of one region and outlet."""
+        result = []
+        for relative in sorted(self.directories):
+            for name in self.directories[relative]["files"]:
+                if not name.lower().endswith(extensions) or not self._lists(relative, name):
+                    continue
+                if (region or outlet) and not matches(name, region, outlet):
+                    continue
+                result.append(os.path.join(relative, name) if relative else name)
+        return result
+
+    def count(self, extensions):
+        return sum(
+            1 for relative, entry in self.directories.items()
+            for name in entry["files"] if name.lower().endswith(extensions) and self._lists(relative, name)
+        )
+
+def shard_folder(folder, extensions=('.jpg', '.jpeg', '.png', '.webp')):
+    """Move the images at the top of a flat folder into region/outlet shards."""
+    moved = 0
+    with os.scandir(folder) as entries:
+        names = [entry.name for entry in entries if entry.is_file() and entry.name.lower().endswith(extensions)]
+    for name in names:
+        dest_path = sharded_path(folder, name)
+        try:
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(os.path.join(folder, name), dest_path)
+            moved += 1
+        except Exception as e:
+            logging.error(f"Error moving {name} into its shard: {e}")
+    return moved
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cataloginator folder tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    shard_parser = subparsers.add_parser("shard", help="Move the images of a flat folder into region/outlet shards")
+    shard_parser.add_argument("folder")
+    args = parser.parse_args()
+    if args.command == "shard":
+        print(f"Moved {shard_folder(args.folder)} images into shards of {args.folder}")
@@ -0,0 +1,215 @@
+import logging
+import threading
+import tkinter as tk
+from tkinter import ttk
+from collections import OrderedDict
+from queue import Queue, Empty
+from PIL import Image, ImageTk
+
+class ThumbnailGrid(ttk.Frame):
+    """Virtualized, scrollable grid of image thumbnails with multi-selection.
+
+    Only the cells that fit in the window exist as widgets. Scrolling reassigns those cells
+    to other images and pastes new pixels into each cell's own PhotoImage, so widget and
+    image memory stays the same whatever the number of images. Thumbnails are decoded by a
+    background thread and kept in a bounded LRU cache.
+    """
+
+    def __init__(self, parent, load_thumbnail, thumb_size, cache_size, on_selection_change=None):
+        super().__init__(parent)
+        self.load_thumbnail = load_thumbnail
+        self.thumb_size = thumb_size
+        self.cell_size = (thumb_size[0] + 16, thumb_size[1] + 36)
+        self.cache_size = cache_size
+        self.on_selection_change = on_selection_change
+
+        self.items = []
+        self.selected = set()
+        self.anchor = None
+        self.first_row = 0
+        self.columns = 1
+        self.visible_rows = 1
+        self.cells = []
+        self.cache = OrderedDict()
+        self.wanted = set()
+        self.placeholder = Image.new("RGB", thumb_size, (64, 64, 64))
+
+        self.body = tk.Frame(self, bg="white")
+        self.body.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.body.bind("<Configure>", self.relayout)
+        for widget in (self, self.body):
+            widget.bind("<MouseWheel>", lambda e: self.scroll_rows(-1 if e.delta > 0 else 1))  # Windows
+            widget.bind("<Button-4>", lambda e: self.scroll_rows(-1))  # Linux scroll up
+            widget.bind("<Button-5>", lambda e: self.scroll_rows(1))  # Linux scroll down
+
+        # Thumbnail decoding happens off the Tk thread, PhotoImage updates on it
+        self.requests = Queue()
+        self.results = Queue()
+        self.stop_event = threading.Event()
+        threading.Thread(target=self._thumbnail_worker, daemon=True).start()
+        self.bind("<Destroy>", self.on_destroy)
+        self.after(30, self._poll_results)
+
+    def on_destroy(self, event):
+        if event.widget is self:
+            self.stop_event.set()
+            self.requests.put(None)  # Wake the worker so it can exit
+
+    def set_items(self, items):
+        self.items = list(items)
+        self.selected &= set(self.items)
+        self.first_row = min(self.first_row, self.max_first_row())
+        self.render()
+        self._selection_changed()
+
+    def rows(self):
+        return (len(self.items) + self.columns - 1) // self.columns
+
+    def max_first_row(self):
+        return max(0, self.rows() - self.visible_rows + 1)
+
+    def relayout(self, event=None):
+        """Resize the cell pool to the number of cells that fit in the window."""
+        width = max(self.body.winfo_width(), self.cell_size[0])
+        height = max(self.body.winfo_height(), self.cell_size[1])
+        self.columns = max(1, width // self.cell_size[0])
+        self.visible_rows = height // self.cell_size[1] + 1
+        pool_size = self.columns * self.visible_rows
+
+        while len(self.cells) < pool_size:
+            photo = ImageTk.PhotoImage("RGB", self.thumb_size)
+            label = tk.Label(
+                self.body, image=photo, compound="top", font=("arial.ttf", 8),
+                bd=3, relief="flat", bg="white", width=self.thumb_size[0]
+            )
+            label.image = photo  # Keep reference
+            cell = {"label": label, "photo": photo, "name": None}
+            label.bind("<Button-1>", lambda e, c=cell: self.on_click(c, e))
+            label.bind("<MouseWheel>", lambda e: self.scroll_rows(-1 if e.delta > 0 else 1))
+            label.bind("<Button-4>", lambda e: self.scroll_rows(-1))
+            label.bind("<Button-5>", lambda e: self.scroll_rows(1))
+            self.cells.append(cell)
+        while len(self.cells) > pool_size:
+            self.cells.pop()["label"].destroy()
+
+        for k, cell in enumerate(self.cells):
+            row, column = divmod(k, self.columns)
+            cell["label"].place(x=column * self.cell_size[0], y=row * self.cell_size[1])
+            cell["name"] = None  # Force repaint
+        self.first_row = min(self.first_row, self.max_first_row())
+        self.render()
+
+    def render(self):
+        """Assign visible images to the cell pool."""
+        start = self.first_row * self.columns
+        wanted = set()
+        for k, cell in enumerate(self.cells):
+            index = start + k
+            label = cell["label"]
+            if index >= len(self.items):
+                if cell["name"] is not None:
+                    cell["photo"].paste(self.placeholder)
+                    label.config(text="", bg="white")
+                    cell["name"] = None
+                continue
+            name = self.items[index]
+            thumbnail = self.cache.get(name)
+            if thumbnail is None:
+                wanted.add(name)
+            if cell["name"] != name:
+                cell["name"] = name
+                if thumbnail is None:
+                    cell["photo"].paste(self.placeholder)
+                    self.requests.put(name)
+                else:
+                    self.cache.move_to_end(name)
+                    cell["photo"].paste(thumbnail)
+                label.config(text=name if len(name) <= 28 else name[:25] + "...")
+            label.config(bg="dodger blue" if name in self.selected else "white")
+        self.wanted = wanted
+
+        total = max(1, self.rows())
+        self.scrollbar.set(self.first_row / total, min(1.0, (self.first_row + self.visible_rows) / total))
+
+    def scroll_rows(self, delta):
+        first_row = max(0, min(self.first_row + delta, self.max_first_row()))
+        if first_row != self.first_row:
+            self.first_row = first_row
+            self.render()
+
+    def on_scrollbar(self, command, value, unit=None):
+        if command == "moveto":
+            self.first_row = max(0, min(int(float(value) * self.rows()), self.max_first_row()))
+            self.render()
+        elif command == "scroll":
+            self.scroll_rows(int(value) * (self.visible_rows - 1 if unit == "pages" else 1))
+
+    def on_click(self, cell, event):
+        name = cell["name"]
+        if name is None:
+            return
+        if event.state & 0x0001 and self.anchor in self.items:  # Shift: select range from the last click
+            low, high = sorted((self.items.index(self.anchor), self.items.index(name)))
+            self.selected.update(self.items[low:high + 1])
+        elif name in self.selected:
+            self.selected.discard(name)
+        else:
+            self.selected.add(name)
+        self.anchor = name
+        self.render()
+        self._selection_changed()
+
+    def select_all(self):
+        self.selected = set(self.items)
+        self.render()
+        self._selection_changed()
+
+    def clear_selection(self):
+        self.selected = set()
+        self.render()
+        self._selection_changed()
+
+    def selection(self):
+        """Selected images, in grid order."""
+        return [name for name in self.items if name in self.selected]
+
+    def _selection_changed(self):
+        if self.on_selection_change:
+            self.on_selection_change(len(self.selected), len(self.items))
+
+    def _thumbnail_worker(self):
+        while not self.stop_event.is_set():
+            name = self.requests.get()
+            # Skip images scrolled out of view before their turn came
+            if name is None or name not in self.wanted:
+                continue
+            try:
+                img = self.load_thumbnail(name, self.thumb_size)
+                img.thumbnail(self.thumb_size, Image.Resampling.LANCZOS)
+                cell_image = self.placeholder.copy()
+                cell_image.paste(
+                    img.convert("RGB"),
+                    ((self.thumb_size[0] - img.size[0]) // 2, (self.thumb_size[1] - img.size[1]) // 2)
+                )
+                self.results.put((name, cell_image))
+            except Exception as e:
+                logging.error(f"Error loading thumbnail for {name}: {e}")
+
+    def _poll_results(self):
+        if self.stop_event.is_set():
+            return
+        try:
+            while True:
+                name, cell_image = self.results.get_nowait()
+                self.cache[name] = cell_image
+                self.cache.move_to_end(name)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+                for cell in self.cells:
+                    if cell["name"] == name:
+                        cell["photo"].paste(cell_image)
+        except Empty:
+            pass
+        self.after(30, self._poll_results)
@@ -12,7 +12,26 @@ import openpyxl
 from openpyxl.utils import get_column_letter
 
 from webdownloader import async_download_manager
+from duplicates import DuplicateIndex
+import imagepack
+from previews import PreviewIndex
+from gridview import ThumbnailGrid
 import config
+import imageencoding
+import folderindex
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+# Defect buttons of the cataloging window, one list per row
+DEFECT_ROWS = [
+    ["Switched\nOFF", "Screen/\nSAS"],
+    ["Header\nnot\nworking", "Low\nvisibility\nin header", "Shelf\nlight", "Adjust\nshelves", "Top\nshelf"],
+    ["Legal\nissue", "Visible\ncontent\nin header", "Short\nvertical\ninsert", "Shelf light\non comp"],
+    ["Physical\ndamage", "Header\nbroken", "BWU not\nclosing", "Broken\nflap", "Missing\nshelf"],
+    ["Shelf\nstrip\nbase", "Shelf-strip\ninsert", "Гнушка", "No POSM", "Client price\ntag over\nshelfstrip"],
+    ["Header\npossible\nto install", "No content\nin header"],
+    ["EMPTY 1", "EMPTY 2", "EMPTY 3", "EMPTY 4", "EMPTY 5"]
+]
 
 class ImageDownloaderGUI:
     def __init__(self, root):
@@ -84,9 +103,18 @@ class ImageDownloaderGUI:
         self.button_browse_catalog_folder = tk.Button(self.catalog_frame, text="Browse", command=self.browse_catalog_folder)
         self.button_browse_catalog_folder.pack(pady=10)
 
+        # Optional region / outlet filter, matched against the bwu.region.outlet.scene file names
+        self.label_catalog_filter = tk.Label(self.catalog_frame, text="Filter (region or region.outlet, optional):")
+        self.label_catalog_filter.pack(pady=10)
+        self.entry_catalog_filter = tk.Entry(self.catalog_frame, width=40)
+        self.entry_catalog_filter.pack()
+
         # Begin button
         self.button_begin = tk.Button(self.catalog_frame, text="Begin", command=self.start_cataloging)
         self.button_begin.pack(pady=20, side="bottom")
+        # Grid mode button, for marking many images OK or Hold at once
+        self.button_grid = tk.Button(self.catalog_frame, text="Grid mode", command=self.start_grid_cataloging)
+        self.button_grid.pack(side="bottom")
 
     def browse_excel(self):
         file_path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx *.xls")])
@@ -141,10 +169,10 @@ class ImageDownloaderGUI:
     def update_progress(self):
         try:
             while True:
-                current, total = self.progress_queue.get_nowait()
+                current, total, concurrency = self.progress_queue.get_nowait()
                 percentage = (current / total) * 100
                 self.progress_bar["value"] = percentage
-                self.progress_label.config(text=f"Processed {current}/{total} rows")
+                self.progress_label.config(text=f"Processed {current}/{total} rows\nConcurrency: {concurrency}")
         except Empty:
             pass
         if self.button_download["state"] == "disabled":
@@ -156,9 +184,14 @@ class ImageDownloaderGUI:
         self.progress_bar["value"] = 0
 
         if success:
-            image_count = len(
-                [f for f in os.listdir(save_folder) if os.path.isfile(os.path.join(save_folder, f))]
-            )
+            if imagepack.is_pack_folder(save_folder):
+                pack = imagepack.PackReader(save_folder)
+                image_count = len(pack)
+                pack.close()
+            else:
+                listing = folderindex.FolderIndex(save_folder)
+                listing.save()
+                image_count = listing.count(IMAGE_EXTENSIONS)
             messagebox.showinfo(
                 "Success", f"Download completed successfully!\n{image_count} images downloaded."
             )
@@ -168,9 +201,22 @@ class ImageDownloaderGUI:
 
     def start_cataloging(self):
         catalog_folder = self.entry_catalog_folder.get()
+        prepared = self.prepare_cataloging(catalog_folder)
+        if prepared:
+            # Open cataloging window
+            self.open_cataloging_window(catalog_folder, *prepared)
+
+    def start_grid_cataloging(self):
+        catalog_folder = self.entry_catalog_folder.get()
+        prepared = self.prepare_cataloging(catalog_folder)
+        if prepared:
+            self.open_grid_window(catalog_folder, *prepared)
+
+    # Set up folders, report and indexes for a catalog folder. Returns (images, processed, hold) or None
+    def prepare_cataloging(self, catalog_folder):
         if not catalog_folder:
             messagebox.showerror("Error", "Please select a catalog folder.")
-            return
+            return None
 
         # Create processed and hold folders
         processed_folder = Path("./") / "processed"
@@ -178,22 +224,71 @@ class ImageDownloaderGUI:
         processed_folder.mkdir(exist_ok=True)
         hold_folder.mkdir(exist_ok=True)
 
-        # Get list of images
-        image_extensions = ('.jpg', '.jpeg', '.png')
-        images = [
-            f for f in os.listdir(catalog_folder)
-            if os.path.isfile(os.path.join(catalog_folder, f)) and f.lower().endswith(image_extensions)
-        ]
+        # One catalog session at a time: close the window of a previous session, which releases
+        # its pack and indexer, then anything left from a session that never opened a window
+        if getattr(self, 'catalog_window', None) is not None and self.catalog_window.winfo_exists():
+            self.catalog_window.destroy()
+        self.catalog_window = None
+        self.close_catalog()
+
+        # Get list of images, from the pack index if the folder holds an image pack,
+        # otherwise from the folder listing index (paths relative to the folder, flat or sharded)
+        region, _, outlet = self.entry_catalog_filter.get().strip().partition('.')
+        if imagepack.is_pack_folder(catalog_folder):
+            self.catalog_pack = imagepack.PackReader(catalog_folder)
+            images = [
+                f for f in self.catalog_pack.names()
+                if f.lower().endswith(IMAGE_EXTENSIONS) and folderindex.matches(f, region, outlet)
+            ]
+        else:
+            self.catalog_pack = None
+            listing = folderindex.FolderIndex(catalog_folder)
+            listing.save()
+            images = listing.images(IMAGE_EXTENSIONS, region, outlet)
 
         if not images:
             messagebox.showinfo("Info", "No images found in the selected folder.")
-            return
+            self.close_catalog()
+            return None
 
         # Initialize Excel report
         self.initialize_excel_report(catalog_folder)
 
-        # Open cataloging window
-        self.open_cataloging_window(catalog_folder, images, processed_folder, hold_folder)
+        # Previews written by the downloader, if any
+        self.preview_index = PreviewIndex(catalog_folder)
+
+        # Sizes of the defect re-saves of this session, written when the session closes
+        self.encoding_report = imageencoding.EncodingReport("catalog")
+
+        # Hash catalog images in the background for duplicate detection
+        self.duplicate_index = DuplicateIndex(
+            Path("./") / config.DUPLICATE_CACHE_FILE, Path("./") / config.DUPLICATE_DECISIONS_FILE
+        )
+        self.duplicate_index.start_indexing(catalog_folder, images, self.catalog_pack)
+
+        return images, processed_folder, hold_folder
+
+    # Stop the hash indexer and close the pack of the current catalog session, if any
+    def close_catalog(self):
+        if getattr(self, 'duplicate_index', None):
+            self.duplicate_index.close()
+        self.duplicate_index = None
+        if getattr(self, 'catalog_pack', None) is not None:
+            self.catalog_pack.close()
+        self.catalog_pack = None
+        if getattr(self, 'encoding_report', None) is not None:
+            self.encoding_report.write(config.ENCODING_REPORT_FILE)
+        self.encoding_report = None
+
+    # The pack, indexer and report belong to the session of the window that was opened last
+    def attach_catalog_window(self, window):
+        self.catalog_window = window
+        window.bind('<Destroy>', lambda e: self.on_catalog_window_destroy(e, window))
+
+    def on_catalog_window_destroy(self, event, window):
+        if event.widget is window and window is getattr(self, 'catalog_window', None):
+            self.catalog_window = None
+            self.close_catalog()
 
     def initialize_excel_report(self, catalog_folder):
         self.excel_path = Path("./") / "catalog_report.xlsx"
@@ -284,6 +379,7 @@ class ImageDownloaderGUI:
         catalog_window.minsize(800, 600)  # Ensure minimum size for usability
         # Exit maximized window with Escape key
         catalog_window.bind('<Escape>', lambda e: catalog_window.destroy())
+        self.attach_catalog_window(catalog_window)
 
         self.current_image_index = 0
         self.is_zoomed = False
@@ -300,6 +396,18 @@ class ImageDownloaderGUI:
         self.image_label.bind("<Button-1>", lambda e: self.toggle_zoom(e, catalog_folder, images, catalog_window))
         self.filename_label = tk.Label(image_frame, text="", font=("arial.ttf", 12))
         self.filename_label.pack(side="top", padx=20, pady=5)
+        # Near-duplicate notice, shown only when the image matches an earlier decision
+        self.duplicate_frame = ttk.Frame(image_frame)
+        self.duplicate_frame.pack(side="top", pady=5)
+        self.duplicate_label = tk.Label(self.duplicate_frame, text="", fg="orange", font=("arial.ttf", 11))
+        self.duplicate_label.pack(side="left", padx=5)
+        self.duplicate_button = tk.Button(
+            self.duplicate_frame, text="Apply previous decision", font=("arial.ttf", 11),
+            command=lambda: self.apply_previous_decision(
+                catalog_folder, images, processed_folder, hold_folder, catalog_window
+            )
+        )
+        self.duplicate_match = None
 
         # Center frame for OK, Hold, Submit buttons
         center_frame = ttk.Frame(main_frame, width=150)  # Fixed width for buttons
@@ -402,15 +510,6 @@ class ImageDownloaderGUI:
         defects_label.pack(anchor="w")
         self.defect_vars = {}
         self.defect_buttons = {}
-        defect_rows = [
-            ["Switched\nOFF", "Screen/\nSAS"],
-            ["Header\nnot\nworking", "Low\nvisibility\nin header", "Shelf\nlight", "Adjust\nshelves", "Top\nshelf"],
-            ["Legal\nissue", "Visible\ncontent\nin header", "Short\nvertical\ninsert", "Shelf light\non comp"],
-            ["Physical\ndamage", "Header\nbroken", "BWU not\nclosing", "Broken\nflap", "Missing\nshelf"],
-            ["Shelf\nstrip\nbase", "Shelf-strip\ninsert", "Гнушка", "No POSM", "Client price\ntag over\nshelfstrip"],
-            ["Header\npossible\nto install", "No content\nin header"],
-            ["EMPTY 1", "EMPTY 2", "EMPTY 3", "EMPTY 4", "EMPTY 5"]
-        ]
 
         def toggle_defect(defect, var):
             var.set(not var.get())
@@ -420,7 +519,7 @@ class ImageDownloaderGUI:
                 activebackground="red" if var.get() else "gray"
             )
 
-        for row_defects in defect_rows:
+        for row_defects in DEFECT_ROWS:
             row_frame = ttk.Frame(defects_frame)
             row_frame.pack(fill="x", pady=2)
             for defect in row_defects:
@@ -461,19 +560,28 @@ class ImageDownloaderGUI:
             self.image_label.config(image=None)
             self.image_label.config(text="No more images to catalog!", font=("arial.ttf", 24))
             self.filename_label.config(text="")
+            self.duplicate_label.config(text="")
+            self.duplicate_button.pack_forget()
+            self.duplicate_image = None
             return
 
         image_path = os.path.join(catalog_folder, images[self.current_image_index])
         try:
-            # Load and resize image to default thumbnail size
-            img = Image.open(image_path)
+            # Load and resize image to default thumbnail size, from the preview when there is one
+            img = self.open_preview(image_path)
             max_size = (800, 600)
             img.thumbnail(max_size, Image.Resampling.LANCZOS)
             photo = ImageTk.PhotoImage(img)
             self.image_label.config(image=photo, text="")
             self.image_label.image = photo  # Keep reference
-            # Update file name label
-            self.filename_label.config(text=images[self.current_image_index])
+            # Update file name label, with the full resolution if the preview index has it
+            record = self.preview_index.get(os.path.basename(images[self.current_image_index]))
+            if record:
+                self.filename_label.config(
+                    text=f"{images[self.current_image_index]} ({record['width']}x{record['height']})"
+                )
+            else:
+                self.filename_label.config(text=images[self.current_image_index])
             # Reset zoom state
             self.zoom_level = 0
             # Reset BWU, defect states, and comments
@@ -486,6 +594,7 @@ class ImageDownloaderGUI:
                 button.config(bg="gray", activebackground="gray")
             if hasattr(self, 'comments_entry'):
                 self.comments_entry.delete(0, tk.END)
+            self.check_duplicate(image_path)
         except Exception as e:
             logging.error(f"Error loading image {image_path}: {e}")
             self.image_label.config(text="Error loading image", font=("Arial", 20))
@@ -497,35 +606,216 @@ class ImageDownloaderGUI:
 
         current_image = images[self.current_image_index]
         source_path = os.path.join(catalog_folder, current_image)
-        ok_folder = Path("./") / "ok"
-        if action == "ok":
-            ok_folder.mkdir(exist_ok=True)
-            dest_folder = ok_folder
-        else:
-            dest_folder = processed_folder if action == "processed" else hold_folder
+        dest_folder = self.destination_folder(action, processed_folder, hold_folder)
         dest_path = os.path.join(dest_folder, current_image)
+        # Sharded catalog folders keep their region/outlet subfolders in the destination
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
 
         try:
-            # Save to Excel and add defects to image only on Submit
-            if action == "processed":
-                self.save_to_excel(current_image)
-                self.draw_defects_on_image(source_path)
-            # Copy for OK, move for others
-            if action == "ok":
-                shutil.move(source_path, dest_path)
-                logging.debug(f"Copied {current_image} to ok folder")
+            value = self.cached_image_hash(source_path)
+            if self.catalog_pack is not None:
+                # Packed images are extracted to the destination folder and dropped from the pack index
+                self.catalog_pack.extract(current_image, dest_path)
+                if action == "processed":
+                    self.save_to_excel(current_image)
+                    self.draw_defects_on_image(dest_path)
+                self.catalog_pack.remove(current_image)
+                logging.debug(f"Extracted {current_image} to {action} folder")
             else:
-                shutil.move(source_path, dest_path)
-                logging.debug(f"Moved {current_image} to {action} folder")
+                # Save to Excel and add defects to image only on Submit
+                if action == "processed":
+                    self.save_to_excel(current_image)
+                    self.draw_defects_on_image(source_path)
+                # Copy for OK, move for others
+                if action == "ok":
+                    shutil.move(source_path, dest_path)
+                    logging.debug(f"Copied {current_image} to ok folder")
+                else:
+                    shutil.move(source_path, dest_path)
+                    logging.debug(f"Moved {current_image} to {action} folder")
         except Exception as e:
             logging.error(f"Error processing {current_image} to {action} folder: {e}")
             messagebox.showerror("Error", f"Failed to process {current_image}: {e}")
             return
 
+        self.record_decision(source_path, value, dest_path, action)
+        self.preview_index.discard(os.path.basename(current_image))
+
         # Move to next image
         self.current_image_index += 1
         self.load_image(catalog_folder, images, catalog_window)
 
+    def destination_folder(self, action, processed_folder, hold_folder):
+        if action == "ok":
+            ok_folder = Path("./") / "ok"
+            ok_folder.mkdir(exist_ok=True)
+            return ok_folder
+        return processed_folder if action == "processed" else hold_folder
+
+    # Move several images to the ok or hold folder at once (grid mode). Returns the names that were moved
+    def process_images_batch(self, catalog_folder, names, processed_folder, hold_folder, action):
+        dest_folder = self.destination_folder(action, processed_folder, hold_folder)
+        done = []
+        decisions = []
+        for name in names:
+            source_path = os.path.join(catalog_folder, name)
+            dest_path = os.path.join(dest_folder, name)
+            try:
+                value = self.cached_image_hash(source_path)
+                if self.catalog_pack is not None:
+                    self.catalog_pack.extract(name, dest_path)
+                    self.catalog_pack.remove(name)
+                else:
+                    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                    shutil.move(source_path, dest_path)
+                self.preview_index.discard(os.path.basename(name))
+                done.append(name)
+                if getattr(self, 'duplicate_index', None):
+                    decisions.append(
+                        (source_path, value, dest_path, self.duplicate_index.decision(source_path, action, "", [], ""))
+                    )
+            except Exception as e:
+                logging.error(f"Error processing {name} to {action} folder: {e}")
+        # Decisions of the whole batch are appended at once
+        if decisions:
+            self.duplicate_index.record_decisions(decisions, self.catalog_pack)
+        logging.debug(f"Moved {len(done)} images to {action} folder")
+        return done
+
+    def open_grid_window(self, catalog_folder, images, processed_folder, hold_folder):
+        grid_window = tk.Toplevel(self.root)
+        grid_window.title("Catalog Grid")
+        screen_width = grid_window.winfo_screenwidth()
+        screen_height = grid_window.winfo_screenheight()
+        grid_window.geometry(
+            f"{int(screen_width * 0.8)}x{int(screen_height * 0.8)}+{int(screen_width * 0.1)}+{int(screen_height * 0.1)}"
+        )
+        grid_window.minsize(800, 600)
+        grid_window.bind('<Escape>', lambda e: grid_window.destroy())
+        self.attach_catalog_window(grid_window)
+
+        # Toolbar with selection count and batch actions
+        toolbar = ttk.Frame(grid_window)
+        toolbar.pack(side="top", fill="x", padx=10, pady=5)
+        count_label = tk.Label(toolbar, text="", font=("arial.ttf", 12))
+        count_label.pack(side="left", padx=5)
+
+        grid = ThumbnailGrid(
+            grid_window,
+            lambda name, size: self.load_grid_thumbnail(os.path.join(catalog_folder, name), size),
+            config.GRID_THUMBNAIL_SIZE,
+            config.GRID_CACHE_SIZE,
+            on_selection_change=lambda selected, total: count_label.config(
+                text=f"{selected} selected / {total} images"
+            )
+        )
+
+        def mark(action):
+            names = grid.selection()
+            if not names:
+                return
+            done = set(self.process_images_batch(catalog_folder, names, processed_folder, hold_folder, action))
+            if len(done) < len(names):
+                messagebox.showerror("Error", f"Failed to process {len(names) - len(done)} images, see errors.log")
+            grid.set_items([name for name in grid.items if name not in done])
+
+        tk.Button(
+            toolbar, text="Hold", bg="yellow", fg="black", width=10, font=("arial.ttf", 12),
+            command=lambda: mark("hold")
+        ).pack(side="right", padx=5)
+        tk.Button(
+            toolbar, text="OK", bg="green", fg="white", width=10, font=("arial.ttf", 12),
+            command=lambda: mark("ok")
+        ).pack(side="right", padx=5)
+        tk.Button(toolbar, text="Clear", width=10, command=grid.clear_selection).pack(side="right", padx=5)
+        tk.Button(toolbar, text="Select all", width=10, command=grid.select_all).pack(side="right", padx=5)
+        grid_window.bind('<Control-a>', lambda e: grid.select_all())
+
+        grid.pack(side="top", fill="both", expand=True, padx=10, pady=5)
+        grid.set_items(images)
+
+    def load_grid_thumbnail(self, image_path, size):
+        img = self.open_preview(image_path)
+        # Let the JPEG decoder downscale while decoding
+        img.draft('RGB', size)
+        return img
+
+    def open_catalog_image(self, image_path):
+        if getattr(self, 'catalog_pack', None) is not None:
+            return Image.open(self.catalog_pack.open(os.path.basename(image_path)))
+        return Image.open(image_path)
+
+    def open_preview(self, image_path):
+        preview = self.preview_index.open(os.path.basename(image_path))
+        return preview if preview is not None else self.open_catalog_image(image_path)
+
+    def check_duplicate(self, image_path):
+        self.duplicate_match = None
+        self.duplicate_image = image_path
+        self.duplicate_label.config(text="")
+        self.duplicate_button.pack_forget()
+        if not getattr(self, 'duplicate_index', None):
+            return
+        value = self.duplicate_index.cached_hash(image_path, self.catalog_pack)
+        if value is None:
+            # Not hashed yet: never decode on the Tk thread, let the background indexer do it next
+            self.duplicate_index.request_hash(image_path)
+            self.root.after(100, self.poll_duplicate, image_path)
+            return
+        self.show_duplicate(value)
+
+    def poll_duplicate(self, image_path):
+        if image_path != self.duplicate_image or not getattr(self, 'duplicate_index', None):
+            return  # Moved on to another image or folder
+        value = self.duplicate_index.cached_hash(image_path, self.catalog_pack)
+        if value is not None:
+            self.show_duplicate(value)
+        elif self.duplicate_index.is_pending(image_path):
+            self.root.after(100, self.poll_duplicate, image_path)
+
+    def show_duplicate(self, value):
+        match = self.duplicate_index.find_duplicate(value)
+        if match:
+            self.duplicate_match = match
+            self.duplicate_label.config(
+                text=f"Possible duplicate of {match['image']} ({match['action']})"
+            )
+            self.duplicate_button.pack(side="left", padx=5)
+
+    # Hash of a catalog image if the indexer already has it. Look it up before the image is modified or moved
+    def cached_image_hash(self, image_path):
+        if not getattr(self, 'duplicate_index', None):
+            return None
+        return self.duplicate_index.cached_hash(image_path, self.catalog_pack)
+
+    # Remember the decision made for an image after it was moved. Without a cached hash the indexer
+    # thread hashes the moved file and records it, so nothing is decoded on the Tk thread
+    def record_decision(self, image_path, value, dest_path, action):
+        if not getattr(self, 'duplicate_index', None):
+            return
+        selected_defects = [defect for defect, var in self.defect_vars.items() if var.get()]
+        comment = self.comments_entry.get().strip() if hasattr(self, 'comments_entry') else ""
+        record = self.duplicate_index.decision(image_path, action, self.bwu_var.get(), selected_defects, comment)
+        self.duplicate_index.record_decisions([(image_path, value, dest_path, record)], self.catalog_pack)
+
+    def apply_previous_decision(self, catalog_folder, images, processed_folder, hold_folder, catalog_window):
+        match = self.duplicate_match
+        if not match:
+            return
+        # Restore the BWU type, defects and comment of the earlier decision, then submit it
+        self.bwu_var.set(match.get("bwu", ""))
+        for bwu_type, button in self.bwu_buttons.items():
+            color = "red" if bwu_type == self.bwu_var.get() else "gray"
+            button.config(bg=color, activebackground=color)
+        previous_defects = set(match.get("defects", []))
+        for defect, var in self.defect_vars.items():
+            var.set(defect in previous_defects)
+            color = "red" if var.get() else "gray"
+            self.defect_buttons[defect].config(bg=color, activebackground=color)
+        self.comments_entry.delete(0, tk.END)
+        self.comments_entry.insert(0, match.get("comment", ""))
+        self.process_image(catalog_folder, images, processed_folder, hold_folder, catalog_window, match["action"])
+
     def save_to_excel(self, image_name):
         try:
             wb = openpyxl.load_workbook(self.excel_path)
@@ -533,7 +823,7 @@ class ImageDownloaderGUI:
             row = ws.max_row + 1
 
             # Parse filename (assuming format: bwu.region.outlet.scene.jpg)
-            parts = image_name.rsplit('.', 4)  # Split on last 4 dots
+            parts = os.path.basename(image_name).rsplit('.', 4)  # Split on last 4 dots
             if len(parts) >= 4:
                 bwu, region, outlet, scene = parts[:4]
             else:
@@ -618,10 +908,9 @@ class ImageDownloaderGUI:
                     else:
                         selected_defects.append(defect)
 
-            # Prepare text
+            # Prepare text, nothing to draw means no re-encode
             defect_text = "\n".join(selected_defects)
             if not defect_text:
-                img.save(image_path, 'JPEG')
                 return
 
             # Get image dimensions
@@ -638,7 +927,9 @@ class ImageDownloaderGUI:
 
             # Draw yellow text
             draw.text((text_x, text_y), defect_text, fill="yellow", font=font)
-            img.save(image_path, 'JPEG')
+            imageencoding.save_image(
+                img, image_path, config.DEFECT_IMAGE_PROFILE, report=getattr(self, 'encoding_report', None)
+            )
             logging.debug(f"Added defects to {image_path}")
         except Exception as e:
             logging.error(f"Error adding defects to {image_path}: {e}")
@@ -649,7 +940,6 @@ class ImageDownloaderGUI:
 
         image_path = os.path.join(catalog_folder, images[self.current_image_index])
         try:
-            img = Image.open(image_path)
             screen_width = catalog_window.winfo_screenwidth()
             screen_height = catalog_window.winfo_screenheight()
 
@@ -658,6 +948,7 @@ class ImageDownloaderGUI:
 
             if self.zoom_level == 0:
                 # Thumbnail size
+                img = self.open_preview(image_path)
                 max_size = (800, 600)
                 img.thumbnail(max_size, Image.Resampling.LANCZOS)
                 photo = ImageTk.PhotoImage(img)
@@ -665,6 +956,7 @@ class ImageDownloaderGUI:
                 self.image_label.image = photo  # Keep reference
             elif self.zoom_level == 1:
                 # Full size with scroll wheel zoom in new window
+                img = self.open_catalog_image(image_path)
                 zoom_window = tk.Toplevel(catalog_window)
                 zoom_window.title("Zoomed Image")
                 # Set window size to fit within screen
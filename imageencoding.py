@@ -0,0 +1,114 @@
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+import config
+
+EXTENSIONS = {"JPEG": ".jpg", "WEBP": ".webp"}
+
+def profile_format(profile_name):
+    return config.ENCODING_PROFILES[profile_name]["format"].upper()
+
+def with_profile_extension(filename, profile_name):
+    """Give a file name the extension of the profile's format, replacing .jpg/.jpeg/.webp."""
+    extension = EXTENSIONS[profile_format(profile_name)]
+    stem, dot, suffix = filename.rpartition('.')
+    if dot and '.' + suffix.lower() in ('.jpg', '.jpeg', '.webp'):
+        filename = stem
+    return filename + extension
+
+def save_options(img, profile_name, image_format=None):
+    """Pillow save() keyword arguments for an encoding profile."""
+    profile = config.ENCODING_PROFILES[profile_name]
+    image_format = image_format or profile_format(profile_name)
+    # "keep" reuses the source JPEG's quantization tables/subsampling, only possible for JPEG to JPEG
+    can_keep = image_format == "JPEG" and getattr(img, "format", None) == "JPEG"
+    quality = profile.get("quality", 90)
+    if quality == "keep" and not can_keep:
+        quality = profile.get("fallback_quality", 90)
+
+    options = {"format": image_format, "quality": quality}
+    if image_format == "JPEG":
+        subsampling = profile.get("subsampling", "4:2:0")
+        if subsampling == "keep" and not can_keep:
+            subsampling = "4:2:0"
+        options.update(
+            subsampling=subsampling,
+            progressive=profile.get("progressive", False),
+            optimize=profile.get("optimize", False)
+        )
+    elif image_format == "WEBP":
+        options.update(method=profile.get("method", 4), lossless=profile.get("lossless", False))
+
+    if profile.get("keep_metadata"):
+        for key in ("exif", "icc_profile"):
+            if img.info.get(key):
+                options[key] = img.info[key]
+    return options
+
+def encode_image(img, profile_name, image_format=None):
+    """Encode a Pillow image with a profile and return the bytes."""
+    options = save_options(img, profile_name, image_format)
+    if options["format"] == "JPEG" and img.mode not in ("RGB", "L", "CMYK"):
+        img = img.convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, **options)
+    return buffer.getvalue()
+
+def save_image(img, path, profile_name, keep_format=True, report=None):
+    """Re-save an image in place with a profile. keep_format keeps the file's current format
+    so its extension stays right. The size before and after goes to report, an EncodingReport.
+    Returns the number of bytes written."""
+    image_format = img.format if keep_format and img.format in EXTENSIONS else None
+    data = encode_image(img, profile_name, image_format)
+    bytes_in = os.path.getsize(path) if os.path.exists(path) else 0
+    with open(path, 'wb') as f:
+        f.write(data)
+    if report is not None:
+        report.add(profile_name, bytes_in, len(data))
+    return len(data)
+
+class EncodingReport:
+    """Bytes in and out per profile for one run, appended as a JSON line to the report file.
+
+    run names what produced the bytes, "download" or "catalog".
+    """
+
+    def __init__(self, run):
+        self.run = run
+        self.lock = threading.Lock()
+        self.totals = {}
+
+    def add(self, profile_name, bytes_in, bytes_out):
+        with self.lock:
+            count, total_in, total_out = self.totals.get(profile_name, (0, 0, 0))
+            self.totals[profile_name] = (count + 1, total_in + bytes_in, total_out + bytes_out)
+
+    def summary(self):
+        return ", ".join(
+            f"{profile}: {count} images, {total_in / 1024 ** 2:.1f} MB -> {total_out / 1024 ** 2:.1f} MB "
+            f"({(total_in - total_out) / 1024 ** 2:+.1f} MB saved)"
+            for profile, (count, total_in, total_out) in self.totals.items()
+        )
+
+    def write(self, report_path):
+        if not self.totals:
+            return
+        record = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "run": self.run,
+            "profiles": {
+                profile: {"images": count, "bytes_in": total_in, "bytes_out": total_out,
+                          "bytes_saved": total_in - total_out}
+                for profile, (count, total_in, total_out) in self.totals.items()
+            }
+        }
+        try:
+            with open(report_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+        except Exception as e:
+            logging.error(f"Error writing encoding report {report_path}: {e}")
+        logging.info(f"Encoding report ({self.run}): {self.summary()}", extra={"stage": "encoding"})
@@ -0,0 +1,238 @@
+import argparse
+import io
+import logging
+import mmap
+import struct
+import threading
+from pathlib import Path
+
+# Pack folder layout: images.idx holds fixed-size records, images.NNNN.pack holds the raw image bytes
+INDEX_FILE = "images.idx"
+PACK_FILE = "images.{:04d}.pack"
+INDEX_MAGIC = b"CIPK"
+INDEX_VERSION = 1
+HEADER = struct.Struct('<4sHH')
+# flags, pack number, offset, length, utf-8 filename (null padded)
+RECORD = struct.Struct('<B3xIQQ160s')
+FLAG_DELETED = 1
+
+def is_pack_folder(folder):
+    """True if the folder holds a packed image archive instead of plain files."""
+    return (Path(folder) / INDEX_FILE).is_file()
+
+def read_records(index_data):
+    """Yield (slot, flags, pack number, offset, length, name) for every complete record of an index."""
+    usable = (len(index_data) - HEADER.size) // RECORD.size * RECORD.size
+    for slot, (flags, pack_number, offset, length, raw_name) in enumerate(
+            RECORD.iter_unpack(index_data[HEADER.size:HEADER.size + usable])):
+        yield slot, flags, pack_number, offset, length, raw_name.rstrip(b'\0').decode('utf-8')
+
+class MemoryviewFile(io.RawIOBase):
+    """Read-only file object over a memoryview, so Pillow can decode without copying the slice."""
+
+    def __init__(self, view):
+        self.view = view
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        # Release the slice so the pack map can be closed
+        self.view.release()
+        super().close()
+
+    def readinto(self, buffer):
+        size = min(len(buffer), len(self.view) - self.position)
+        if size <= 0:
+            return 0
+        buffer[:size] = self.view[self.position:self.position + size]
+        self.position += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        else:
+            self.position = len(self.view) + offset
+        return self.position
+
+    def tell(self):
+        return self.position
+
+class PackWriter:
+    """Append images to pack files in a folder, rolling over to a new pack at max_pack_bytes.
+
+    Appending a name that is already in the pack replaces it, like overwriting a plain file:
+    the earlier record is marked deleted, or nothing is written if the bytes are identical.
+    """
+
+    def __init__(self, folder, max_pack_bytes):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_pack_bytes = max_pack_bytes
+        self.lock = threading.Lock()
+
+        # Live records by name, so reruns into the same folder supersede instead of duplicating
+        self.live = {}
+        index_path = self.folder / INDEX_FILE
+        if index_path.exists():
+            self.index_file = open(index_path, 'r+b')
+            index_data = self.index_file.read()
+            self.slot_count = 0
+            for slot, flags, pack_number, offset, length, name in read_records(index_data):
+                self.slot_count = slot + 1
+                if not flags & FLAG_DELETED:
+                    self.live.setdefault(name, []).append((slot, pack_number, offset, length))
+            # Drop a partially written trailing record
+            self.index_file.truncate(HEADER.size + self.slot_count * RECORD.size)
+        else:
+            self.index_file = open(index_path, 'w+b')
+            self.index_file.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, RECORD.size))
+            self.slot_count = 0
+
+        # Continue in the last existing pack file
+        self.pack_number = 0
+        while (self.folder / PACK_FILE.format(self.pack_number + 1)).exists():
+            self.pack_number += 1
+        self.pack_file = open(self.folder / PACK_FILE.format(self.pack_number), 'ab')
+
+    def append(self, name, data):
+        encoded_name = name.encode('utf-8')
+        if len(encoded_name) > RECORD.size - 24:
+            raise ValueError(f"File name too long for image pack: {name}")
+        with self.lock:
+            previous = self.live.get(name, [])
+            if len(previous) == 1 and self._same_bytes(previous[0], data):
+                return
+            if self.pack_file.tell() > 0 and self.pack_file.tell() + len(data) > self.max_pack_bytes:
+                self.pack_file.close()
+                self.pack_number += 1
+                self.pack_file = open(self.folder / PACK_FILE.format(self.pack_number), 'ab')
+            offset = self.pack_file.tell()
+            self.pack_file.write(data)
+            self.index_file.seek(HEADER.size + self.slot_count * RECORD.size)
+            self.index_file.write(RECORD.pack(0, self.pack_number, offset, len(data), encoded_name))
+            for slot, *_ in previous:
+                self.index_file.seek(HEADER.size + slot * RECORD.size)
+                self.index_file.write(bytes([FLAG_DELETED]))
+            self.live[name] = [(self.slot_count, self.pack_number, offset, len(data))]
+            self.slot_count += 1
+
+    def _same_bytes(self, record, data):
+        _, pack_number, offset, length = record
+        if length != len(data):
+            return False
+        if pack_number == self.pack_number:
+            self.pack_file.flush()
+        try:
+            with open(self.folder / PACK_FILE.format(pack_number), 'rb') as f:
+                f.seek(offset)
+                return f.read(length) == data
+        except OSError:
+            return False
+
+    def close(self):
+        with self.lock:
+            self.pack_file.close()
+            self.index_file.close()
+
+class PackReader:
+    """Memory-mapped view of a pack folder with O(1) lookup by file name."""
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self.index_file = open(self.folder / INDEX_FILE, 'r+b')
+        self.index_map = mmap.mmap(self.index_file.fileno(), 0)
+        magic, version, record_size = HEADER.unpack_from(self.index_map, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or record_size != RECORD.size:
+            raise ValueError(f"Unsupported image pack index in {self.folder}")
+
+        # Later records for the same name win; deleted records are skipped. Every live slot
+        # of a name is remembered so remove() can delete older copies too.
+        self.entries = {}
+        self.slots = {}
+        for slot, flags, pack_number, offset, length, name in read_records(self.index_map):
+            if flags & FLAG_DELETED:
+                continue
+            self.entries[name] = (slot, pack_number, offset, length)
+            self.slots.setdefault(name, []).append(slot)
+        self.pack_maps = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def names(self):
+        return list(self.entries)
+
+    def entry(self, name):
+        """Return (slot, pack number, offset, length) of an image."""
+        return self.entries[name]
+
+    def _pack_map(self, pack_number):
+        if pack_number not in self.pack_maps:
+            with open(self.folder / PACK_FILE.format(pack_number), 'rb') as f:
+                self.pack_maps[pack_number] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.pack_maps[pack_number]
+
+    def read(self, name):
+        """Zero-copy memoryview of the image bytes."""
+        _, pack_number, offset, length = self.entries[name]
+        return memoryview(self._pack_map(pack_number))[offset:offset + length]
+
+    def open(self, name):
+        return io.BufferedReader(MemoryviewFile(self.read(name)))
+
+    def extract(self, name, dest_path):
+        with open(dest_path, 'wb') as f:
+            f.write(self.read(name))
+
+    def remove(self, name):
+        """Mark an image as deleted in the index. Its bytes stay in the pack file."""
+        del self.entries[name]
+        for slot in self.slots.pop(name):
+            self.index_map[HEADER.size + slot * RECORD.size] = FLAG_DELETED
+        self.index_map.flush()
+
+    def close(self):
+        # Images still open on a pack keep its map alive until they are garbage collected
+        for pack_map in self.pack_maps.values():
+            try:
+                pack_map.close()
+            except BufferError:
+                pass
+        self.pack_maps = {}
+        self.index_map.close()
+        self.index_file.close()
+
+def extract_all(pack_folder, out_folder):
+    """Write every image of a pack folder to out_folder as a plain file."""
+    reader = PackReader(pack_folder)
+    Path(out_folder).mkdir(parents=True, exist_ok=True)
+    count = 0
+    for name in reader.names():
+        try:
+            reader.extract(name, Path(out_folder) / name)
+            count += 1
+        except Exception as e:
+            logging.error(f"Error extracting {name} from {pack_folder}: {e}")
+    reader.close()
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cataloginator image pack tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    extract_parser = subparsers.add_parser("extract", help="Extract packed images to plain files")
+    extract_parser.add_argument("pack_folder")
+    extract_parser.add_argument("out_folder")
+    args = parser.parse_args()
+    if args.command == "extract":
+        print(f"Extracted {extract_all(args.pack_folder, args.out_folder)} images to {args.out_folder}")
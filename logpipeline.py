@@ -0,0 +1,126 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+from datetime import datetime
+from queue import SimpleQueue
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format records as one JSON object per line, with row index and stage when given."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "thread": record.threadName
+        }
+        for field in ("row", "stage", "url"):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        # TracebackQueueHandler has already turned exc_info into exc_text
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class TracebackQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps the formatted traceback in exc_text instead of merging it
+    into the message, so JsonLinesFormatter can write it as a separate "exception" field."""
+
+    traceback_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        # Like QueueHandler.prepare: merge args and drop the traceback object before queueing
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.traceback_formatter.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+class RateLimitedHandler(logging.Handler):
+    """Pass at most `limit` records per call site per `window` seconds to `target`.
+
+    Records over the limit are counted and written as a single summary record when the
+    window for that call site rolls over, or when logging shuts down.
+    """
+
+    def __init__(self, target, limit, window):
+        super().__init__()
+        self.target = target
+        self.limit = limit
+        self.window = window
+        self.counters = {}
+
+    def emit(self, record):
+        key = (record.levelno, getattr(record, "stage", None), record.pathname, record.lineno)
+        start, count, suppressed = self.counters.get(key, (record.created, 0, 0))
+        if record.created - start >= self.window:
+            if suppressed:
+                self._emit_summary(key, suppressed, start)
+            start, count, suppressed = record.created, 0, 0
+        if count < self.limit:
+            self.target.handle(record)
+            count += 1
+        else:
+            suppressed += 1
+        self.counters[key] = (start, count, suppressed)
+
+    def _emit_summary(self, key, suppressed, start):
+        levelno, stage, pathname, lineno = key
+        summary = logging.makeLogRecord({
+            "name": "root",
+            "levelno": levelno,
+            "levelname": logging.getLevelName(levelno),
+            "pathname": pathname,
+            "lineno": lineno,
+            "msg": f"Suppressed {suppressed} similar messages in {self.window}s window "
+                   f"starting {datetime.fromtimestamp(start).isoformat(timespec='seconds')}",
+            "stage": stage
+        })
+        self.target.handle(summary)
+
+    def flush(self):
+        for key, (start, count, suppressed) in list(self.counters.items()):
+            if suppressed:
+                self._emit_summary(key, suppressed, start)
+                self.counters[key] = (start, count, 0)
+        self.target.flush()
+
+    def close(self):
+        self.flush()
+        self.target.close()
+        super().close()
+
+def setup_logging(filename, level, max_bytes, backup_count, rate_limit, rate_window):
+    """Route all logging through a queue to a background writer thread.
+
+    Callers on the asyncio and Tk threads only enqueue the record; formatting, rate
+    limiting and the rotating file writes happen on the listener thread.
+    """
+    file_handler = logging.handlers.RotatingFileHandler(
+        filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+    )
+    file_handler.setFormatter(JsonLinesFormatter())
+    writer = RateLimitedHandler(file_handler, rate_limit, rate_window)
+
+    log_queue = SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(TracebackQueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(log_queue, writer)
+    listener.start()
+
+    def shutdown():
+        listener.stop()
+        writer.close()
+
+    atexit.register(shutdown)
+    return listener
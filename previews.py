@@ -0,0 +1,102 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from PIL import Image
+
+import imageencoding
+
+# Sidecar layout inside the save folder: preview JPEGs plus a JSON-lines index
+PREVIEW_FOLDER = "_previews"
+INDEX_FILE = "previews.jsonl"
+
+class PreviewWriter:
+    """Write preview thumbnails, dimensions and content hashes while the downloader holds the decoded image.
+
+    With a report (an EncodingReport), each preview counts as extra output: 0 bytes in, preview bytes out.
+    """
+
+    def __init__(self, save_folder, size, profile_name, report=None):
+        self.folder = Path(save_folder) / PREVIEW_FOLDER
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.size = size
+        self.profile_name = profile_name
+        self.report = report
+        self.lock = threading.Lock()  # add() runs in the downloader's executor threads
+        self.index_file = open(self.folder / INDEX_FILE, 'a', encoding='utf-8')
+
+    def add(self, name, img, data):
+        """Record a derivative of a decoded image. img is modified in place, so call this last."""
+        try:
+            width, height = img.size
+            img.thumbnail(self.size, Image.Resampling.LANCZOS)
+            encoded = imageencoding.encode_image(img, self.profile_name)
+            with open(self.folder / name, 'wb') as f:
+                f.write(encoded)
+            if self.report is not None:
+                # Previews are stored on top of the image, so they only add output bytes
+                self.report.add(self.profile_name, 0, len(encoded))
+            record = {
+                "name": name,
+                "width": width,
+                "height": height,
+                "bytes": len(data),
+                "sha256": hashlib.sha256(data).hexdigest()
+            }
+            with self.lock:
+                self.index_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logging.error(f"Error writing preview for {name}: {e}", extra={"stage": "preview"})
+
+    def add_from_bytes(self, name, data):
+        """Decode data and record its derivative, for images the downloader did not decode itself."""
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                self.add(name, img, data)
+        except Exception as e:
+            logging.error(f"Error decoding {name} for preview: {e}", extra={"stage": "preview"})
+
+    def close(self):
+        with self.lock:
+            self.index_file.close()
+
+class PreviewIndex:
+    """Look up previews written by PreviewWriter for a catalog folder."""
+
+    def __init__(self, catalog_folder):
+        self.folder = Path(catalog_folder) / PREVIEW_FOLDER
+        self.records = {}
+        index_path = self.folder / INDEX_FILE
+        if index_path.exists():
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            record = json.loads(line)
+                            self.records[record["name"]] = record
+            except Exception as e:
+                logging.error(f"Error loading preview index {index_path}: {e}")
+
+    def get(self, name):
+        """Return the name, width, height, bytes and sha256 recorded for an image, or None."""
+        return self.records.get(name)
+
+    def open(self, name):
+        """Open the preview of an image, or return None if there is none."""
+        if name not in self.records:
+            return None
+        try:
+            return Image.open(self.folder / name)
+        except OSError:
+            return None
+
+    def discard(self, name):
+        """Forget an image that left the catalog folder and delete its preview."""
+        if self.records.pop(name, None) is not None:
+            try:
+                os.remove(self.folder / name)
+            except OSError:
+                pass
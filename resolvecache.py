@@ -0,0 +1,93 @@
+import logging
+import sqlite3
+import time
+
+class ResolutionCache:
+    """Persistent page URL -> image URL cache with a TTL and size-bounded LRU eviction.
+
+    Entries live in a SQLite file so they survive between runs. Reads refresh the entry's
+    last-used time; when the cache grows past max_entries the least recently used entries
+    are dropped.
+    """
+
+    def __init__(self, path, ttl, max_entries, commit_every=200):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.commit_every = commit_every
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS resolutions ("
+            "page_url TEXT PRIMARY KEY, image_url TEXT NOT NULL, "
+            "resolved_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS resolutions_last_used ON resolutions (last_used)"
+        )
+        self.connection.commit()
+        self.count = self.connection.execute("SELECT COUNT(*) FROM resolutions").fetchone()[0]
+
+    def get(self, page_url):
+        """Return the cached image URL for a page, or None if missing or expired."""
+        now = time.time()
+        row = self.connection.execute(
+            "SELECT image_url, resolved_at FROM resolutions WHERE page_url = ?", (page_url,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        image_url, resolved_at = row
+        if now - resolved_at > self.ttl:
+            self.invalidate(page_url)
+            self.misses += 1
+            return None
+        self.connection.execute(
+            "UPDATE resolutions SET last_used = ? WHERE page_url = ?", (now, page_url)
+        )
+        self._mark_dirty()
+        self.hits += 1
+        return image_url
+
+    def put(self, page_url, image_url):
+        now = time.time()
+        cursor = self.connection.execute(
+            "UPDATE resolutions SET image_url = ?, resolved_at = ?, last_used = ? WHERE page_url = ?",
+            (image_url, now, now, page_url)
+        )
+        if cursor.rowcount == 0:
+            self.connection.execute(
+                "INSERT INTO resolutions (page_url, image_url, resolved_at, last_used) VALUES (?, ?, ?, ?)",
+                (page_url, image_url, now, now)
+            )
+            self.count += 1
+            if self.count > self.max_entries:
+                self._evict(self.count - self.max_entries)
+        self._mark_dirty()
+
+    def invalidate(self, page_url):
+        cursor = self.connection.execute("DELETE FROM resolutions WHERE page_url = ?", (page_url,))
+        self.count -= cursor.rowcount
+        self._mark_dirty()
+
+    def _evict(self, excess):
+        cursor = self.connection.execute(
+            "DELETE FROM resolutions WHERE page_url IN "
+            "(SELECT page_url FROM resolutions ORDER BY last_used LIMIT ?)", (excess,)
+        )
+        self.count -= cursor.rowcount
+
+    def _mark_dirty(self):
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.connection.commit()
+            self.pending = 0
+
+    def close(self):
+        try:
+            self.connection.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Error saving resolution cache: {e}")
+        self.connection.close()
+        logging.info(f"Resolution cache: {self.hits} hits, {self.misses} misses", extra={"stage": "resolve_cache"})
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import random
+import time
+import urllib.parse
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+class RetryableError(Exception):
+    """A fetch failed in a way that may succeed later (429, 5xx, connection error)."""
+
+    def __init__(self, error_class, url, status=None, retry_after=None):
+        super().__init__(f"{error_class} error for {url}" + (f" (status {status})" if status else ""))
+        self.error_class = error_class
+        self.url = url
+        self.status = status
+        self.retry_after = retry_after
+
+def parse_retry_after(value):
+    """Parse a Retry-After header given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def error_for_response(response, url):
+    """Return a RetryableError for a retryable HTTP status, None otherwise."""
+    if response.status == 429:
+        return RetryableError(
+            "rate_limit", url, response.status, parse_retry_after(response.headers.get("Retry-After"))
+        )
+    if response.status >= 500:
+        return RetryableError(
+            "server", url, response.status, parse_retry_after(response.headers.get("Retry-After"))
+        )
+    return None
+
+class RetryScheduler:
+    """Decide when failed work is retried, without the work holding a download slot meanwhile.
+
+    Callers release their slot, ask schedule() for a delay and park() the work item, which is
+    handed back through its resume callback when due.
+    Each error class has its own retry budget per work item. Retry-After on a 429 pauses the
+    whole host, so no other row hammers it during the wait. A Retry-After longer than
+    max_delay uses up the budget instead, so neither the row nor the host waits past max_delay.
+    """
+
+    def __init__(self, budgets, backoff_factor, max_delay):
+        self.budgets = budgets
+        self.backoff_factor = backoff_factor
+        self.max_delay = max_delay
+        self.host_resume_at = {}
+        self.parked = 0
+        self.retries = {error_class: 0 for error_class in budgets}
+
+    def schedule(self, error, attempts, row_index=None):
+        """Count a retry of error.error_class in attempts and return its delay, or None if out of budget."""
+        used = attempts.get(error.error_class, 0)
+        if used >= self.budgets.get(error.error_class, 0):
+            return None
+        if error.retry_after is not None and error.retry_after > self.max_delay:
+            # Waiting longer than max_delay would stall the run, count it as the budget used up
+            attempts[error.error_class] = self.budgets[error.error_class]
+            logging.warning(
+                f"{error}, Retry-After {error.retry_after:.0f}s exceeds {self.max_delay}s, not retrying",
+                extra={"row": row_index, "stage": "retry", "url": error.url}
+            )
+            return None
+        attempts[error.error_class] = used + 1
+
+        # Exponential backoff with equal jitter, never sooner than Retry-After
+        backoff = min(self.max_delay, self.backoff_factor * (2 ** used))
+        delay = backoff / 2 + random.uniform(0, backoff / 2)
+        if error.retry_after is not None:
+            delay = max(delay, error.retry_after)
+            if error.error_class == "rate_limit":
+                host = urllib.parse.urlsplit(error.url).netloc
+                self.host_resume_at[host] = max(self.host_resume_at.get(host, 0), time.monotonic() + error.retry_after)
+
+        self.retries[error.error_class] = self.retries.get(error.error_class, 0) + 1
+        logging.warning(
+            f"{error}, retry {used + 1}/{self.budgets[error.error_class]} in {delay:.1f}s",
+            extra={"row": row_index, "stage": "retry", "url": error.url}
+        )
+        return delay
+
+    def host_delay(self, url):
+        """Seconds left of a Retry-After pause on the URL's host, 0 if it is not paused."""
+        host = urllib.parse.urlsplit(url).netloc
+        return max(0.0, self.host_resume_at.get(host, 0) - time.monotonic())
+
+    def park(self, delay, resume):
+        """Call resume() after delay seconds on the running event loop, without holding a worker meanwhile."""
+        self.parked += 1
+
+        def wake():
+            self.parked -= 1
+            resume()
+        asyncio.get_running_loop().call_later(delay, wake)
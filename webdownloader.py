@@ -1,4 +1,6 @@
 import asyncio
+import functools
+import io
 import logging
 import urllib.parse
 import re
@@ -10,34 +12,45 @@ import pandas as pd
 from bs4 import BeautifulSoup
 
 import config
+import imageencoding
+import folderindex
+from concurrency import ConcurrencyController
+from imagepack import PackWriter
+from previews import PreviewWriter
+from resolvecache import ResolutionCache
+from retryscheduler import RetryableError, RetryScheduler, error_for_response
 
-async def fetch_html(session, url, retries=3, backoff_factor=1):
-    """Fetch HTML content from a URL with retries."""
+async def fetch_html(session, url, row_index=None):
+    """Fetch HTML content from a URL.
+
+    Rate limits, server errors and connection errors raise RetryableError, so the caller
+    can retry later through the RetryScheduler without holding a download slot.
+    """
+    log_extra = {"row": row_index, "stage": "fetch_html", "url": url}
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
     }
-    for attempt in range(retries):
-        try:
-            async with session.get(url, headers=headers, timeout=30) as response:
-                if response.status == 200:
-                    return await response.text()
-                elif response.status == 429:
-                    wait_time = backoff_factor * (2 ** attempt)
-                    logging.warning(f"Rate limit hit for {url}, waiting {wait_time}s")
-                    await asyncio.sleep(wait_time)
-                else:
-                    logging.error(f"Failed to fetch {url}: Status {response.status}")
-                    return None
-        except Exception as e:
-            logging.error(f"Error fetching {url} (attempt {attempt + 1}/{retries}): {e}")
-            if attempt < retries - 1:
-                wait_time = backoff_factor * (2 ** attempt)
-                await asyncio.sleep(wait_time)
-    logging.error(f"Failed to fetch {url} after {retries} attempts")
-    return None
+    try:
+        async with session.get(url, headers=headers, timeout=30) as response:
+            if response.status == 200:
+                return await response.text()
+            error = error_for_response(response, url)
+            if error:
+                raise error
+            logging.error(f"Failed to fetch {url}: Status {response.status}", extra=log_extra)
+            return None
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.error(f"Error fetching {url}: {e}", extra=log_extra)
+        raise RetryableError("network", url) from e
+    except RetryableError:
+        raise
+    except Exception as e:
+        logging.error(f"Error fetching {url}: {e}", extra=log_extra)
+        return None
 
-async def get_image_url(html_content, base_url):
+async def get_image_url(html_content, base_url, row_index=None):
     """Parse HTML to find the first .jpg image URL."""
+    log_extra = {"row": row_index, "stage": "parse_html", "url": base_url}
     if not html_content:
         return None
     try:
@@ -46,127 +59,300 @@ async def get_image_url(html_content, base_url):
         if img_tag and img_tag['src']:
             img_url = urllib.parse.urljoin(base_url, img_tag['src'])
             return img_url
-        logging.warning(f"No .jpg image found in {base_url}")
+        logging.warning(f"No .jpg image found in {base_url}", extra=log_extra)
         return None
     except Exception as e:
-        logging.error(f"Error parsing HTML for {base_url}: {e}")
+        logging.error(f"Error parsing HTML for {base_url}: {e}", extra=log_extra)
         return None
 
-async def download_image(session, img_url, filename, save_folder, date_str):
-    """Download and save an image, then add date in yellow text at bottom right."""
+async def download_image(session, img_url, row_index=None):
+    """Download the raw bytes of an image.
+
+    Only the HTTP request runs here, so the caller can hold its concurrency slot for just
+    the network time. Returns None on a non-retryable failure. Retryable failures raise
+    RetryableError like fetch_html.
+    """
+    log_extra = {"row": row_index, "stage": "download_image", "url": img_url}
     try:
         async with session.get(img_url, timeout=30) as response:
             if response.status == 200:
-                safe_filename = re.sub(r'[^\w\-_\. ]', '_', filename)
-                if not safe_filename.lower().endswith('.jpg'):
-                    safe_filename += '.jpg'
+                return await response.read()
+            error = error_for_response(response, img_url)
+            if error:
+                raise error
+            logging.warning(f"Failed to download {img_url}: Status {response.status}", extra=log_extra)
+            return None
+    except RetryableError:
+        raise
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.error(f"Error downloading {img_url}: {e}", extra=log_extra)
+        raise RetryableError("network", img_url) from e
+    except Exception as e:
+        logging.error(f"Error downloading {img_url}: {e}", extra=log_extra)
+        return None
 
-                save_path = Path(save_folder) / safe_filename
-                with open(save_path, 'wb') as f:
-                    f.write(await response.read())
-                if config.DEBUG:
-                    print(f"Saved image: {save_path}")
+def save_image(data, img_url, filename, save_folder, date_str, row_index=None, pack_writer=None, preview_writer=None,
+               encoding_report=None):
+    """Save downloaded image bytes, then add date in yellow text at bottom right.
+
+    The stamped image is encoded once with config.DOWNLOAD_PROFILE; images that cannot be
+    stamped are stored exactly as downloaded. With a pack_writer the result is appended to
+    the image pack instead of being written as a separate file. With a preview_writer a
+    preview, the dimensions and a content hash are recorded from the same decoded image.
+    This is CPU work, run it in an executor thread rather than on the event loop.
+    Returns True if the image was saved.
+    """
+    log_extra = {"row": row_index, "stage": "save_image", "url": img_url}
+    try:
+        safe_filename = re.sub(r'[^\w\-_\. ]', '_', filename)
+        if not safe_filename.lower().endswith('.jpg'):
+            safe_filename += '.jpg'
+        original_size = len(data)
+
+        # Add date to the image
+        try:
+            # Parse and format the date
+            date_obj = pd.to_datetime(date_str, errors='coerce')
+            if pd.isna(date_obj):
+                logging.warning(f"Invalid date format for {filename}: {date_str}", extra={**log_extra, "stage": "stamp_date"})
+                if preview_writer is not None:
+                    preview_writer.add_from_bytes(safe_filename, data)
+                return True
+            formatted_date = date_obj.strftime('%Y-%m-%d')
 
-                # Add date to the image
+            # Open the image with Pillow
+            with Image.open(io.BytesIO(data)) as img:
+                draw = ImageDraw.Draw(img)
                 try:
-                    # Parse and format the date
-                    date_obj = pd.to_datetime(date_str, errors='coerce')
-                    if pd.isna(date_obj):
-                        logging.warning(f"Invalid date format for {filename}: {date_str}")
-                        return
-                    formatted_date = date_obj.strftime('%Y-%m-%d')
-
-                    # Open the image with Pillow
-                    with Image.open(save_path) as img:
-                        draw = ImageDraw.Draw(img)
-                        try:
-                            # Use a standard font, fall back to default if unavailable
-                            font = ImageFont.truetype("arial.ttf", 30)
-                        except:
-                            font = ImageFont.load_default()
-
-                        # Get text size and image dimensions
-                        text_bbox = draw.textbbox((0, 0), formatted_date, font=font)
-                        text_width = text_bbox[2] - text_bbox[0]
-                        text_height = text_bbox[3] - text_bbox[1]
-                        img_width, img_height = img.size
-
-                        # Calculate position for bottom-right corner (with padding)
-                        padding = 10
-                        text_x = img_width - text_width - padding
-                        text_y = img_height - text_height - padding
-
-                        # Draw yellow text
-                        draw.text((text_x, text_y), formatted_date, fill=(255, 255, 0), font=font)
-
-                        # Save the modified image
-                        img.save(save_path, 'JPEG')
-                        if config.DEBUG:
-                            print(f"Added date to image: {save_path}")
-                except Exception as e:
-                    logging.error(f"Error adding date to {save_path}: {e}")
+                    # Use a standard font, fall back to default if unavailable
+                    font = ImageFont.truetype("arial.ttf", 30)
+                except:
+                    font = ImageFont.load_default()
+
+                # Get text size and image dimensions
+                text_bbox = draw.textbbox((0, 0), formatted_date, font=font)
+                text_width = text_bbox[2] - text_bbox[0]
+                text_height = text_bbox[3] - text_bbox[1]
+                img_width, img_height = img.size
+
+                # Calculate position for bottom-right corner (with padding)
+                padding = 10
+                text_x = img_width - text_width - padding
+                text_y = img_height - text_height - padding
+
+                # Draw yellow text
+                draw.text((text_x, text_y), formatted_date, fill=(255, 255, 0), font=font)
+
+                # Encode the modified image with the download profile
+                encoded = imageencoding.encode_image(img, config.DOWNLOAD_PROFILE)
+                data = encoded
+                safe_filename = imageencoding.with_profile_extension(safe_filename, config.DOWNLOAD_PROFILE)
+                if encoding_report is not None:
+                    encoding_report.add(config.DOWNLOAD_PROFILE, original_size, len(encoded))
+                if config.DEBUG:
+                    print(f"Added date to image: {safe_filename}")
+
+                # Derivatives from the image still in memory
+                if preview_writer is not None:
+                    preview_writer.add(safe_filename, img, data)
+        except Exception as e:
+            logging.error(f"Error adding date to {safe_filename}: {e}", extra={**log_extra, "stage": "stamp_date"})
+        finally:
+            # Images are stored once, stamped or not
+            if pack_writer is not None:
+                pack_writer.append(safe_filename, data)
             else:
-                logging.warning(f"Failed to download {img_url}: Status {response.status}")
+                if config.OUTPUT_LAYOUT == "sharded":
+                    save_path = folderindex.sharded_path(save_folder, safe_filename)
+                    save_path.parent.mkdir(parents=True, exist_ok=True)
+                else:
+                    save_path = Path(save_folder) / safe_filename
+                with open(save_path, 'wb') as f:
+                    f.write(data)
+                if config.DEBUG:
+                    print(f"Saved image: {save_path}")
+        return True
     except Exception as e:
-        logging.error(f"Error downloading {img_url}: {e}")
-
-async def process_row(session, row, save_folder, semaphore, progress_queue, row_index, total_rows):
-    """Process a single row with semaphore and report progress."""
-    async with semaphore:
-        url = row[0]
-        filename = str(row[1]).strip()
-        date_str = str(row[2]).strip() if len(row) > 2 else ''
-
-        if not url or not filename:
-            logging.warning(f"Skipping row with empty URL or filename: {url}, {filename}")
-            progress_queue.put((row_index + 1, total_rows))
-            return
-
-        if not validators.url(url):
-            logging.warning(f"Invalid URL: {url}")
-            progress_queue.put((row_index + 1, total_rows))
-            return
-
-        html_content = await fetch_html(session, url)
-        if html_content:
-            img_url = await get_image_url(html_content, url)
-            if img_url:
-                await download_image(session, img_url, filename, save_folder, date_str)
-        progress_queue.put((row_index + 1, total_rows))
-
-async def process_batch(session, batch, save_folder, semaphore, progress_queue, start_index, total_rows):
-    """Process a batch of rows."""
-    tasks = [
-        process_row(session, row, save_folder, semaphore, progress_queue, start_index + i, total_rows)
-        for i, (_, row) in enumerate(batch.iterrows())
-    ]
-    await asyncio.gather(*tasks)
-
-async def async_download_manager(excel_file, save_folder, progress_queue, max_concurrent=50, batch_size=100):
-    """Main function to process the Excel file and download images."""
+        logging.error(f"Error saving {filename}: {e}", extra=log_extra)
+        return False
+
+class RowJob:
+    """Work item for one Excel row. Keeps the resolved image URL and the retry attempts
+    between passes through the work queue, so a retry resumes at the failed stage."""
+
+    def __init__(self, row, row_index, priority):
+        self.priority = priority
+        self.url = row[0]
+        self.filename = str(row[1]).strip()
+        self.date_str = str(row[2]).strip() if len(row) > 2 else ''
+        self.row_index = row_index
+        self.img_url = None
+        self.cache_hit = False
+        self.saved = False
+        self.attempts = {}
+        self.started = False
+
+    def __lt__(self, other):
+        # Work queue order: priority, then row order
+        return (self.priority, self.row_index) < (other.priority, other.row_index)
+
+async def process_row(session, job, save_folder, controller, pack_writer=None, resolution_cache=None,
+                      retry_scheduler=None, preview_writer=None, encoding_report=None):
+    """Run one pass of a row within the controller's per-host limits.
+
+    A resolution_cache hit skips fetching and parsing the landing page. Returns None when the
+    row is finished, or the delay in seconds after which it should be queued again: after a
+    retryable failure (within the retry_scheduler budget) or while its host is paused.
+    """
+    log_extra = {"row": job.row_index, "stage": "validate_row", "url": job.url}
+
+    if not job.started:
+        job.started = True
+        if not job.url or not job.filename:
+            logging.warning(f"Skipping row with empty URL or filename: {job.url}, {job.filename}", extra=log_extra)
+            return None
+        if not validators.url(job.url):
+            logging.warning(f"Invalid URL: {job.url}", extra=log_extra)
+            return None
+        if resolution_cache is not None:
+            job.img_url = resolution_cache.get(job.url)
+            job.cache_hit = job.img_url is not None
+
+    try:
+        if job.img_url is None:
+            host_delay = retry_scheduler.host_delay(job.url) if retry_scheduler is not None else 0
+            if host_delay > 0:
+                return host_delay
+            async with controller.slot(job.url):
+                html_content = await fetch_html(session, job.url, row_index=job.row_index)
+            job.img_url = await get_image_url(html_content, job.url, job.row_index)
+            if job.img_url is None:
+                return None
+            if resolution_cache is not None:
+                resolution_cache.put(job.url, job.img_url)
+        host_delay = retry_scheduler.host_delay(job.img_url) if retry_scheduler is not None else 0
+        if host_delay > 0:
+            return host_delay
+        # The slot (and the latency the controller measures) covers the HTTP request only
+        async with controller.slot(job.img_url):
+            data = await download_image(session, job.img_url, job.row_index)
+        if data is not None:
+            # Decoding, stamping and encoding run in a worker thread, off the event loop
+            job.saved = await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+                save_image, data, job.img_url, job.filename, save_folder, job.date_str, job.row_index, pack_writer,
+                preview_writer, encoding_report
+            ))
+    except RetryableError as e:
+        delay = retry_scheduler.schedule(e, job.attempts, job.row_index) if retry_scheduler is not None else None
+        if delay is not None:
+            return delay
+        logging.error(f"Giving up on {e.url}: {e}", extra={**log_extra, "stage": "retry"})
+    return None
+
+async def download_worker(queue, finish, session, save_folder, controller, pack_writer, resolution_cache,
+                          retry_scheduler, preview_writer, encoding_report):
+    """Take rows from the work queue until cancelled.
+
+    A row that has to wait is parked and put back into the queue when due, so the worker
+    moves straight on to the next row. finish(job) is called once per finished row.
+    """
+    while True:
+        job = await queue.get()
+        try:
+            delay = await process_row(
+                session, job, save_folder, controller, pack_writer, resolution_cache, retry_scheduler,
+                preview_writer, encoding_report
+            )
+        except Exception as e:
+            logging.error(f"Error processing row {job.row_index}: {e}", extra={"row": job.row_index, "stage": "download"})
+            delay = None
+        if delay is None:
+            finish(job)
+        else:
+            job.priority = 0
+            retry_scheduler.park(delay, lambda job=job: queue.put_nowait(job))
+        queue.task_done()
+
+async def async_download_manager(excel_file, save_folder, progress_queue, max_concurrent=None, workers=None):
+    """Main function to process the Excel file and download images.
+
+    max_concurrent caps the in-flight requests per host (config.CONCURRENCY_MAX by default),
+    the actual limit adapts between config.CONCURRENCY_MIN and that cap. Rows are fed to
+    `workers` download workers (config.DOWNLOAD_WORKERS by default) through one work queue.
+    """
+    max_concurrent = max_concurrent or config.CONCURRENCY_MAX
+    workers = workers or config.DOWNLOAD_WORKERS
     Path(save_folder).mkdir(parents=True, exist_ok=True)
 
     try:
         df = pd.read_excel(excel_file, header=None)
         total_rows = len(df)
         if total_rows == 0:
-            logging.error("Excel file is empty")
+            logging.error("Excel file is empty", extra={"stage": "read_excel"})
             return False, "Excel file is empty"
     except Exception as e:
-        logging.error(f"Error reading Excel file: {e}")
+        logging.error(f"Error reading Excel file: {e}", extra={"stage": "read_excel"})
         return False, str(e)
 
-    batches = [df[i:i + batch_size] for i in range(0, len(df), batch_size)]
-    semaphore = asyncio.Semaphore(max_concurrent)
+    controller = ConcurrencyController(
+        min(config.CONCURRENCY_INITIAL, max_concurrent), config.CONCURRENCY_MIN, max_concurrent,
+        config.CONCURRENCY_LATENCY_TOLERANCE, config.CONCURRENCY_ERROR_THRESHOLD, config.CONCURRENCY_COOLDOWN
+    )
+    pack_writer = PackWriter(save_folder, config.PACK_MAX_BYTES) if config.OUTPUT_FORMAT == "pack" else None
+    encoding_report = imageencoding.EncodingReport("download")
+    preview_writer = None
+    if config.PREVIEWS_ENABLED:
+        preview_writer = PreviewWriter(save_folder, config.PREVIEW_SIZE, config.PREVIEW_PROFILE, encoding_report)
+    retry_scheduler = RetryScheduler(config.RETRY_BUDGETS, config.RETRY_BACKOFF_FACTOR, config.RETRY_MAX_DELAY)
+    resolution_cache = None
+    if config.RESOLUTION_CACHE_ENABLED:
+        resolution_cache = ResolutionCache(
+            config.RESOLUTION_CACHE_FILE, config.RESOLUTION_CACHE_TTL, config.RESOLUTION_CACHE_MAX_ENTRIES
+        )
 
     try:
-        async with aiohttp.ClientSession() as session:
-            for i, batch in enumerate(batches):
-                print(f"Processing batch {i + 1}/{len(batches)}")
-                start_index = i * batch_size
-                await process_batch(session, batch, save_folder, semaphore, progress_queue, start_index, total_rows)
-                await asyncio.sleep(1)
+        # Connection pool is unbounded, the controller decides how many requests are in flight
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+            # Parked rows coming back (priority 0) go ahead of rows not started yet (priority 1)
+            queue = asyncio.PriorityQueue()
+            for row_index, (_, row) in enumerate(df.iterrows()):
+                queue.put_nowait(RowJob(row, row_index, priority=1))
+            finished = 0
+            all_done = asyncio.Event()
+
+            def finish(job):
+                nonlocal finished
+                finished += 1
+                if job.cache_hit and not job.saved:
+                    # The page may point to a new image now, resolve it again on the next run
+                    resolution_cache.invalidate(job.url)
+                progress_queue.put((finished, total_rows, controller.summary()))
+                if finished == total_rows:
+                    all_done.set()
+
+            tasks = [
+                asyncio.create_task(download_worker(
+                    queue, finish, session, save_folder, controller, pack_writer, resolution_cache,
+                    retry_scheduler, preview_writer, encoding_report
+                ))
+                for _ in range(min(workers, total_rows))
+            ]
+            try:
+                await all_done.wait()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            logging.info(f"Download done, concurrency {controller.summary()}", extra={"stage": "concurrency"})
         return True, None
     except Exception as e:
-        logging.warning(f"Error during download: {e}")
-        return False, str(e)
\ No newline at end of file
+        logging.warning(f"Error during download: {e}", extra={"stage": "download"})
+        return False, str(e)
+    finally:
+        if pack_writer is not None:
+            pack_writer.close()
+        if resolution_cache is not None:
+            resolution_cache.close()
+        if preview_writer is not None:
+            preview_writer.close()
+        encoding_report.write(config.ENCODING_REPORT_FILE)
\ No newline at end of file